@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# countModes.py
+# Benchmark of the ways of counting reconciliations
+
+# Reconciles random parasite trees with a small random host tree, so that
+# there are very many co-optimal reconciliations and the exact counts grow
+# large, with each of the counting modes in turn.  Reports the time taken in
+# each mode and the number of digits of the largest exact count, and checks
+# that the log and saturating counts agree with the exact ones.
+
+# Last comes a large instance, a parasite tree with every tip on the same
+# tip of a two-tip host tree.  Its Pareto front has only one vector per
+# parasite tip, but its counts grow by about half a digit per tip, so they
+# run to thousands of digits and exact big-integer arithmetic becomes a
+# large part of the time.
+
+# python libraries
+import argparse
+import math
+import random
+import time
+
+# xscape libraries
+try:
+    import xscape
+except ImportError:
+    import sys
+    from os.path import realpath, dirname, join
+    sys.path.append(join(dirname(dirname(realpath(__file__))), "python"))
+    import xscape
+from xscape.counting import *
+from xscape import reconcileBottomUp
+from xscape.randomTrees import randomTree
+
+def main():
+    parser = argparse.ArgumentParser(description="Counting mode benchmark")
+    parser.add_argument("--host", type=int, default=8, help="number of host tips")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 200],
+                        help="numbers of parasite tips")
+    parser.add_argument("--large", type=int, default=2400,
+                        help="number of parasite tips of the large instance (0 for none)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    hostTree, hostTips = randomTree("h", args.host, "host")
+    print "%10s %8s" % ("parasites", "digits") + \
+          "".join("%12s" % counting.name for counting in COUNTINGS)
+    for size in args.sizes:
+        parasiteTree, parasiteTips = randomTree("p", size, "parasite")
+        phi = dict((tip, random.choice(hostTips)) for tip in parasiteTips)
+        compare(parasiteTree, hostTree, phi, size)
+    if args.large:
+        hostTree, hostTips = randomTree("h", 2, "host")
+        parasiteTree, parasiteTips = randomTree("p", args.large, "parasite")
+        phi = dict((tip, hostTips[0]) for tip in parasiteTips)
+        compare(parasiteTree, hostTree, phi, args.large)
+
+def compare(parasiteTree, hostTree, phi, size):
+    ''' Reconciles the trees with each counting mode, checks the counts
+        against the exact ones, and prints a row of the results. '''
+    times = []
+    results = {}
+    for counting in COUNTINGS:
+        startTime = time.time()
+        results[counting] = reconcileBottomUp.reconcile(parasiteTree, hostTree, phi,
+                                                        0.9, 1.2, 0.9, 1.2, counting=counting)
+        times.append(time.time() - startTime)
+    for exact, log, saturating in zip(results[EXACT], results[LOG], results[SATURATING]):
+        assert abs(log.count - math.log(exact.count)) <= 1e-9 * max(1.0, log.count)
+        assert saturating.count == min(exact.count, SATURATION)
+    digits = max(len(str(CV.count)) for CV in results[EXACT])
+    print "%10d %8d" % (size, digits) + "".join("%11.3fs" % t for t in times)
+
+if __name__ == '__main__': main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+# paretoFilter.py
+# Micro-benchmark for the Pareto filter used in every DP cell
+
+# Compares ParetoFront.minimal, which sweeps the vectors in lexicographic
+# order against an (s, l) staircase in O(n log n) time, with the quadratic
+# filter it replaced, on random fronts of 10^3 to 10^5 candidate vectors.
+# The candidates are drawn near the plane d + s + l = constant so that a
+# large fraction of them is Pareto optimal, which is the hard case.
+
+# python libraries
+import argparse
+import random
+import time
+
+# xscape libraries
+try:
+    import xscape
+except ImportError:
+    import sys
+    from os.path import realpath, dirname, join
+    sys.path.append(join(dirname(dirname(realpath(__file__))), "python"))
+    import xscape
+from xscape.ParetoFront import *
+
+def randomFront(size, spread):
+    ''' Returns a coalesced ParetoFront of (up to) size random candidates. '''
+    vectors = set()
+    for i in range(size):
+        d = random.randint(0, spread)
+        s = random.randint(0, spread)
+        l = 2 * spread - d - s + random.randint(0, spread // 8)
+        vectors.add((0, d, s, max(l, 0)))
+    vectors = list(vectors)
+    return ParetoFront([v[0] for v in vectors], [v[1] for v in vectors],
+                       [v[2] for v in vectors], [v[3] for v in vectors],
+                       [1] * len(vectors))
+
+def quadraticMinimal(front):
+    ''' The Pareto filter used before ParetoFront.minimal:  a lexicographic
+        sort followed by a dominance test of every survivor against all of
+        the vectors. '''
+    d, s, l = front.d, front.s, front.l
+    order = sorted(range(len(front)), key=lambda i: (d[i], s[i], l[i]))
+    if len(order) <= 1: return front.select(order)
+    lexlist = [order[0]]
+    for k in range(1, len(order)):
+        if d[order[k-1]] < d[order[k]] or s[order[k-1]] < s[order[k]]:
+            lexlist.append(order[k])
+    output = []
+    for v in lexlist:
+        minimal = True
+        for w in order:
+            if d[w] <= d[v] and s[w] <= s[v] and l[w] <= l[v] and \
+               (d[w] < d[v] or s[w] < s[v] or l[w] < l[v]):
+                minimal = False
+                break
+        if minimal: output.append(v)
+    return front.select(output)
+
+def timeit(function, front, repeats):
+    ''' Returns the best time of repeats calls of function(front) and the
+        size of its output. '''
+    best = None
+    for r in range(repeats):
+        startTime = time.time()
+        output = function(front)
+        elapsedTime = time.time() - startTime
+        if best is None or elapsedTime < best: best = elapsedTime
+    return best, len(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto filter micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000],
+                        help="numbers of candidate vectors")
+    parser.add_argument("--max-quadratic", type=int, default=10000,
+                        help="largest size on which to run the quadratic filter")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print "%10s %10s %12s %12s %9s" % ("candidates", "front", "quadratic",
+                                       "staircase", "speedup")
+    for size in args.sizes:
+        front = randomFront(size, int(size ** 0.5))
+        newTime, frontSize = timeit(ParetoFront.minimal, front, args.repeats)
+        if size <= args.max_quadratic:
+            oldTime, oldSize = timeit(quadraticMinimal, front, 1)
+            assert oldSize == frontSize
+            print "%10d %10d %11.4fs %11.4fs %8.1fx" % \
+                  (len(front), frontSize, oldTime, newTime, oldTime / newTime)
+        else:
+            print "%10d %10d %12s %11.4fs %9s" % \
+                  (len(front), frontSize, "-", newTime, "-")
+
+if __name__ == '__main__': main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# updateTips.py
+# Check and benchmark of incremental re-reconciliation after tip changes
+
+# Reconciles random tree pairs with the bottom-up engine, then makes a few
+# successive random changes to the tip associations and applies each with
+# updateTips.  Checks that every updated Pareto front, counts included, is
+# the one a reconciliation from scratch gives for the changed associations,
+# and reports the time taken by the updates and by the full runs.
+
+# python libraries
+import argparse
+import random
+import time
+
+# xscape libraries
+try:
+    import xscape
+except ImportError:
+    import sys
+    from os.path import realpath, dirname, join
+    sys.path.append(join(dirname(dirname(realpath(__file__))), "python"))
+    import xscape
+from xscape import reconcileBottomUp
+from xscape.randomTrees import randomTree
+
+BOXES = [(0.1, 10, 0.1, 10), (0.9, 1.2, 0.9, 1.2), (1, 3, 0.5, 2)]
+
+def main():
+    parser = argparse.ArgumentParser(description="updateTips check and benchmark")
+    parser.add_argument("--host", type=int, default=30, help="number of host tips")
+    parser.add_argument("--parasites", type=int, default=30, help="number of parasite tips")
+    parser.add_argument("--trials", type=int, default=10, help="number of random tree pairs")
+    parser.add_argument("--steps", type=int, default=4,
+                        help="number of successive tip changes per tree pair")
+    parser.add_argument("--changes", type=int, default=3,
+                        help="largest number of tips changed at each step")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    updateSeconds = 0.0
+    fullSeconds = 0.0
+    for trial in range(args.trials):
+        hostTree, hostTips = randomTree("h", args.host, "host")
+        parasiteTree, parasiteTips = randomTree("p", args.parasites, "parasite")
+        phi = dict((tip, random.choice(hostTips)) for tip in parasiteTips)
+        box = random.choice(BOXES)
+        algorithm = reconcileBottomUp.ReconcileAlgorithmBottomUp(*box)
+        algorithm.reconcile(parasiteTree, hostTree, phi)
+        for step in range(args.steps):
+            changed = random.sample(parasiteTips, random.randint(1, args.changes))
+            changes = dict((tip, random.choice(hostTips)) for tip in changed)
+            phi.update(changes)
+            startTime = time.time()
+            updated = algorithm.updateTips(changes)
+            updateSeconds += time.time() - startTime
+            startTime = time.time()
+            expected = reconcileBottomUp.reconcile(parasiteTree, hostTree, phi, *box)
+            fullSeconds += time.time() - startTime
+            if sorted(CV.toTupleCDSLCount() for CV in updated) != \
+               sorted(CV.toTupleCDSLCount() for CV in expected):
+                raise AssertionError("trial %d, step %d:  updateTips differs from a full run"
+                                     % (trial, step))
+    updates = args.trials * args.steps
+    print "%d updates match full runs" % updates
+    print "updateTips %.3fs, full runs %.3fs" % (updateSeconds, fullSeconds)
+
+if __name__ == '__main__': main()
@@ -0,0 +1,150 @@
+# CompiledTree.py
+# Integer-indexed tree representation for the reconciliation DP engines
+
+# The dictionary representation of a tree (see reconcile.py) is convenient for
+# reading and writing trees but every lookup hashes a tuple of strings.  A
+# CompiledTree numbers the edges 0, 1, ..., size-1 in post-order, so that
+# every edge has a larger number than both of its child edges and the root
+# edge is numbered size-1, and stores the tree as arrays indexed by edge
+# number.  Edge names are kept in a table so that results can be translated
+# back to the dictionary representation at the I/O boundary.
+
+# Because of the post-order numbering, the edges in the subtree below edge e
+# are exactly those numbered first[e], ..., e, where first[e] is the smallest
+# number in the subtree.  Whether one edge is an ancestor of another is
+# therefore a constant-time comparison of integers.
+
+# python libraries
+from array import array
+
+NONE = -1   # edge number used for a missing parent or child edge
+
+class CompiledTree(object):
+
+    def __init__(self, tree, root=None):
+        ''' Compiles the given tree dictionary.  The root edge is found
+            automatically unless it is given. '''
+        if root is None: root = rootEdge(tree)
+        order = postorder(tree, root)
+
+        self.size = len(order)
+        self.root = self.size - 1
+        self.names = order          # edge number -> edge name
+        self.index = {}             # edge name -> edge number
+        for e, name in enumerate(order):
+            self.index[name] = e
+
+        self.parent = array('i', [NONE] * self.size)
+        self.left = array('i', [NONE] * self.size)
+        self.right = array('i', [NONE] * self.size)
+        self.tip = array('b', [0] * self.size)
+        self.first = array('i', range(self.size))
+        self.endVertex = []         # edge number -> name of its end vertex
+        self.vertexIndex = {}       # end vertex name -> edge number
+        for e, name in enumerate(order):
+            start, end, leftName, rightName = tree[name]
+            self.endVertex.append(end)
+            self.vertexIndex[end] = e
+            if leftName is None:
+                self.tip[e] = 1
+            else:
+                left = self.index[leftName]
+                right = self.index[rightName]
+                self.left[e] = left
+                self.right[e] = right
+                self.parent[left] = e
+                self.parent[right] = e
+                self.first[e] = min(self.first[left], self.first[right])
+
+    def __len__(self):
+        return self.size
+
+    def sibling(self, e):
+        ''' Returns the other child edge of the parent of edge e. '''
+        parent = self.parent[e]
+        if self.left[parent] == e: return self.right[parent]
+        return self.left[parent]
+
+    def comparable(self, e1, e2):
+        ''' Returns True if one of the two edges is a (strict) ancestor of
+            the other. '''
+        return self.first[e1] <= e2 < e1 or self.first[e2] <= e1 < e2
+
+    def landingSites(self, e):
+        ''' Returns the list of edges that are neither (strict) ancestors nor
+            (strict) descendants of edge e, including e itself.  These are
+            the edges numbered below first[e] and the non-ancestors among the
+            edges numbered e or above. '''
+        first = self.first
+        output = range(first[e])
+        output.extend([x for x in xrange(e, self.size) if first[x] > e or x == e])
+        return output
+
+    def landingSitesWithin(self, e, maxDistance):
+        ''' Returns the sorted list of the landing sites of edge e (as in
+            landingSites) that are at most maxDistance edges away from it.
+            The distance is the number of edges on the path from e to the
+            landing site, counting the landing site but not e.  Only the
+            edges within that distance are visited:  for each ancestor a of
+            e (or e itself) that is up edges above e, the sibling subtree of
+            a is searched to depth maxDistance - up. '''
+        output = [e]
+        a = e
+        up = 0
+        while self.parent[a] != NONE and up < maxDistance:
+            stack = [(self.sibling(a), up + 1)]
+            while stack:
+                x, distance = stack.pop()
+                output.append(x)
+                if distance < maxDistance and not self.tip[x]:
+                    stack.append((self.left[x], distance + 1))
+                    stack.append((self.right[x], distance + 1))
+            a = self.parent[a]
+            up += 1
+        output.sort()
+        return output
+
+    def tipAssociations(self, phi, hostTree):
+        ''' Takes the tip associations of this (parasite) tree and the
+            compiled host tree and returns an array mapping each tip edge
+            of this tree to the host tip edge it is associated with.  Entries
+            for internal edges are NONE. '''
+        output = array('i', [NONE] * self.size)
+        for e in range(self.size):
+            if self.tip[e]:
+                output[e] = hostTree.vertexIndex[phi[self.endVertex[e]]]
+        return output
+
+
+def compileTree(tree, root=None):
+    ''' Returns a CompiledTree for the given tree, which may be either a tree
+        dictionary or a CompiledTree (which is returned unchanged). '''
+    if isinstance(tree, CompiledTree): return tree
+    return CompiledTree(tree, root)
+
+def rootEdge(tree):
+    ''' Returns the edge of the given tree dictionary that is not the child
+        of any other edge. '''
+    children = set()
+    for e in tree:
+        children.add(tree[e][2])
+        children.add(tree[e][3])
+    for e in tree:
+        if e not in children: return e
+
+def postorder(tree, root=None):
+    ''' Returns the list of edges of the given tree dictionary in post-order,
+        so that every edge appears after both of its child edges.  Uses an
+        explicit stack so that deep trees do not exhaust the recursion
+        limit. '''
+    if root is None: root = rootEdge(tree)
+    order = []
+    stack = [root]
+    while stack:
+        edge = stack.pop()
+        order.append(edge)
+        if tree[edge][2] is not None:
+            stack.append(tree[edge][2])
+            stack.append(tree[edge][3])
+    order.reverse()
+    return order
@@ -10,18 +10,19 @@
 from string import *
 
 class CostVector:
-    def __init__(self, c, d, s, l, count):
+    def __init__(self, c, d, s, l, count, countLabel="Count"):
         self.c = c
         self.d = d
         self.s = s
         self.l = l
         self.count = count
+        self.countLabel = countLabel    # how the count is shown (see counting.py)
 
     def __add__(self, other):
         ''' add another CostVector '''
         return CostVector(self.c + other.c, self.d + other.d, \
                           self.s + other.s, self.l + other.l, \
-                          self.count * other.count)
+                          self.count * other.count, self.countLabel)
 
     def __mul__(self, CVlist):
         output = []
@@ -31,11 +32,11 @@ class CostVector:
 
     def __repr__(self):
         return "<" + str(self.c) + ", " + str(self.d) + ", " + str(self.s) + \
-               ", " + str(self.l) + "> Count = " + str(self.count)
+               ", " + str(self.l) + "> " + self.countLabel + " = " + str(self.count)
 
     def __str__(self):
         return "<" + str(self.c) + ", " + str(self.d) + ", " + str(self.s) + \
-               ", " + str(self.l) + "> Count = " + str(self.count)
+               ", " + str(self.l) + "> " + self.countLabel + " = " + str(self.count)
 
     def __eq__(self, other):
         return self.d == other.d and self.s == other.s and self.l == other.l
@@ -0,0 +1,367 @@
+# ParetoFront.py
+# Compact column-wise lists of cost vectors for the reconciliation DP
+
+# A ParetoFront holds the same information as a list of CostVectors, but
+# stores the c, d, s, and l entries of all of its vectors in four arrays and
+# their counts in one list, rather than allocating one object per vector.
+# Counts are kept in a plain list because they are exact integers that
+# quickly outgrow a machine word.  An empty ParetoFront takes the place of
+# the [CostVector(INF, INF, INF, INF, 0)] list that marks an impossible
+# placement.
+
+# ParetoFronts are treated as immutable values:  every operation returns a
+# new ParetoFront, and the arrays of unchanged columns may be shared between
+# fronts.  Despite the name, a ParetoFront is not necessarily Pareto optimal
+# until it has been filtered (see ReconcileAlgorithm.paretoFilter).
+
+# Counts are exact integers by default.  The operations that multiply or add
+# counts take a Counting (see counting.py) that says how to do so.
+
+# python libraries
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+
+# xscape libraries
+from CostVector import *
+from counting import *
+
+TYPECODE = 'i'  # array typecode for the c, d, s, and l columns
+
+class ParetoFront(object):
+
+    __slots__ = ("c", "d", "s", "l", "count")
+
+    def __init__(self, c=(), d=(), s=(), l=(), count=()):
+        self.c = array(TYPECODE, c)
+        self.d = array(TYPECODE, d)
+        self.s = array(TYPECODE, s)
+        self.l = array(TYPECODE, l)
+        self.count = list(count)
+
+    @classmethod
+    def single(cls, c, d, s, l, count):
+        ''' Returns a ParetoFront holding the single given vector. '''
+        return cls((c,), (d,), (s,), (l,), (count,))
+
+    @classmethod
+    def concat(cls, fronts):
+        ''' Returns the concatenation of the given list of ParetoFronts. '''
+        output = cls()
+        for front in fronts:
+            output.c.extend(front.c)
+            output.d.extend(front.d)
+            output.s.extend(front.s)
+            output.l.extend(front.l)
+            output.count.extend(front.count)
+        return output
+
+    def __len__(self):
+        return len(self.count)
+
+    def __getstate__(self):
+        # ParetoFronts are pickled to send them between processes
+        return (self.c, self.d, self.s, self.l, self.count)
+
+    def __setstate__(self, state):
+        self.c, self.d, self.s, self.l, self.count = state
+
+    def __add__(self, other):
+        ''' Returns the concatenation of two ParetoFronts. '''
+        output = ParetoFront.__new__(ParetoFront)
+        output.c = self.c + other.c
+        output.d = self.d + other.d
+        output.s = self.s + other.s
+        output.l = self.l + other.l
+        output.count = self.count + other.count
+        return output
+
+    def __repr__(self):
+        return "ParetoFront(" + repr(self.toCostVectors()) + ")"
+
+    def vector(self, i):
+        ''' Returns the i-th vector as a (c, d, s, l) tuple. '''
+        return (self.c[i], self.d[i], self.s[i], self.l[i])
+
+    def costVector(self, i, counting=EXACT):
+        ''' Returns the i-th vector as a CostVector, with its count labelled
+            as the given Counting's. '''
+        return CostVector(self.c[i], self.d[i], self.s[i], self.l[i], self.count[i],
+                          counting.label)
+
+    def toCostVectors(self, counting=EXACT):
+        ''' Returns the list of CostVectors held in this ParetoFront, with
+            their counts labelled as the given Counting's. '''
+        return [self.costVector(i, counting) for i in range(len(self))]
+
+    def select(self, indices):
+        ''' Returns a ParetoFront holding the vectors at the given indices. '''
+        c, d, s, l, count = self.c, self.d, self.s, self.l, self.count
+        return ParetoFront([c[i] for i in indices], [d[i] for i in indices],
+                           [s[i] for i in indices], [l[i] for i in indices],
+                           [count[i] for i in indices])
+
+    def offset(self, c, d, s, l):
+        ''' Returns a ParetoFront in which the given numbers of events are
+            added to every vector.  Counts are unchanged. '''
+        output = ParetoFront.__new__(ParetoFront)
+        output.c = self.c if c == 0 else array(TYPECODE, [x + c for x in self.c])
+        output.d = self.d if d == 0 else array(TYPECODE, [x + d for x in self.d])
+        output.s = self.s if s == 0 else array(TYPECODE, [x + s for x in self.s])
+        output.l = self.l if l == 0 else array(TYPECODE, [x + l for x in self.l])
+        output.count = self.count
+        return output
+
+    def merge(self, other, counting=EXACT):
+        ''' Returns the Minkowski sum of two ParetoFronts:  the sum of every
+            pair of vectors, one from each front, with the product of their
+            counts. '''
+        multiply = counting.multiply
+        return ParetoFront([x + y for x in self.c for y in other.c],
+                           [x + y for x in self.d for y in other.d],
+                           [x + y for x in self.s for y in other.s],
+                           [x + y for x in self.l for y in other.l],
+                           [multiply(x, y) for x in self.count for y in other.count])
+
+    def paretoMerge(self, other, counting=EXACT):
+        ''' Returns the minimal vectors of the Minkowski sum of two
+            ParetoFronts, sorted lexicographically by (d, s, l), with equal
+            sums coalesced.  Strictly dominated sums are never kept, so the
+            result is the same as merge(other).coalesce().minimal() but the
+            full cross product is never built.
+
+            Both fronts are visited in lexicographic order (which costs
+            nothing extra for fronts returned by minimal), so for a fixed
+            vector i of this front the sums with the vectors of the other
+            front come out in lexicographic order too.  A heap holds the next
+            sum of each active row i and the sums are popped in lexicographic
+            order, so a sum can only be dominated by one that was popped
+            before it; the kept sums are summarized by the same staircase as
+            in minimal.  Row i + 1 is only started once row i has produced
+            its first sum.  A row is dropped as soon as a lower bound on all
+            of its remaining sums, built from suffix minima of the s and l
+            columns of the other front, is strictly dominated. '''
+        size1 = len(self)
+        size2 = len(other)
+        if size1 == 0 or size2 == 0: return ParetoFront()
+
+        c1, d1, s1, l1, count1 = self.c, self.d, self.s, self.l, self.count
+        c2, d2, s2, l2, count2 = other.c, other.d, other.s, other.l, other.count
+        multiply = counting.multiply
+        add = counting.add
+        order1 = sorted(range(size1), key=lambda i: (d1[i], s1[i], l1[i]))
+        order2 = sorted(range(size2), key=lambda j: (d2[j], s2[j], l2[j]))
+
+        # minS[k] and minL[k] are the smallest s and l among order2[k:]
+        minS = [0] * size2
+        minL = [0] * size2
+        lowS = lowL = None
+        for k in reversed(range(size2)):
+            j = order2[k]
+            if lowS is None or s2[j] < lowS: lowS = s2[j]
+            if lowL is None or l2[j] < lowL: lowL = l2[j]
+            minS[k] = lowS
+            minL[k] = lowL
+
+        stairS = []         # s values of the staircase steps, increasing
+        stairL = []         # negated l values of the steps, increasing
+        output = ParetoFront()
+        last = None         # (d, s, l) of the last vector kept
+
+        i = order1[0]
+        j = order2[0]
+        heap = [(d1[i] + d2[j], s1[i] + s2[j], l1[i] + l2[j], 0, 0)]
+        while heap:
+            d, s, l, row, k = heappop(heap)
+            i = order1[row]
+            j = order2[k]
+            if k == 0 and row + 1 < size1:
+                # Start the next row, whose sums can't come before this one
+                nextI = order1[row + 1]
+                j0 = order2[0]
+                heappush(heap, (d1[nextI] + d2[j0], s1[nextI] + s2[j0], l1[nextI] + l2[j0], row + 1, 0))
+
+            if (d, s, l) == last:
+                output.count[-1] = add(output.count[-1], multiply(count1[i], count2[j]))
+            else:
+                m = bisect_right(stairS, s)
+                if not (m > 0 and -stairL[m-1] <= l):
+                    output.c.append(c1[i] + c2[j])
+                    output.d.append(d)
+                    output.s.append(s)
+                    output.l.append(l)
+                    output.count.append(multiply(count1[i], count2[j]))
+                    last = (d, s, l)
+                    m = bisect_left(stairS, s, 0, m)
+                    n = bisect_right(stairL, -l, m)
+                    stairS[m:n] = [s]
+                    stairL[m:n] = [-l]
+
+            k += 1
+            if k == size2: continue
+            # Drop the row if even its lower bound is strictly dominated
+            boundS = s1[i] + minS[k]
+            boundL = l1[i] + minL[k]
+            m = bisect_right(stairS, boundS)
+            if m > 0 and -stairL[m-1] <= boundL and \
+               (stairS[m-1] < boundS or -stairL[m-1] < boundL):
+                continue
+            j = order2[k]
+            heappush(heap, (d1[i] + d2[j], s1[i] + s2[j], l1[i] + l2[j], row, k))
+        return output
+
+    def withCospeciations(self, events):
+        ''' Returns a ParetoFront in which the c entry of every vector is
+            set to the given number of events less its duplications and
+            switches.  Every internal vertex of the parasite tree is either
+            a cospeciation, a duplication, or a switch, so this recovers the
+            cospeciation counts of fronts that were computed without them. '''
+        output = ParetoFront.__new__(ParetoFront)
+        output.c = array(TYPECODE, [events - x - y for x, y in zip(self.d, self.s)])
+        output.d = self.d
+        output.s = self.s
+        output.l = self.l
+        output.count = self.count
+        return output
+
+    def boxFilter(self, switchLo, switchHi, lossLo, lossHi):
+        ''' Returns the vectors that may be optimal somewhere in the given
+            range of switch and loss costs:  those whose lowest cost in the
+            range is no more than the least highest cost of any vector. '''
+        if len(self) == 0: return self
+        d, s, l = self.d, self.s, self.l
+        indices = range(len(self))
+        LUB = min([d[i] + s[i] * switchHi + l[i] * lossHi for i in indices])
+        return self.select([i for i in indices
+                            if d[i] + l[i] * lossLo + s[i] * switchLo <= LUB])
+
+    def hullFilter(self, switchLo, switchHi, lossLo, lossHi, tolerance):
+        ''' Returns the vectors that are optimal (to within the given
+            tolerance) at some point of the given range of switch and loss
+            costs, that is, the vectors on the lower envelope of the cost
+            planes over the box.  Assumes that the vectors have been
+            coalesced.
+
+            The region of the box where a vector v is no worse than a set of
+            vectors K is the intersection of one half-plane per vector of K,
+            which is convex and is found by clipping the box polygon.  If K
+            holds every vector on the envelope, the region is exactly where
+            v is optimal.  So K starts out empty and only envelope vectors
+            are added to it:  if the region of v is empty, v is dropped;
+            otherwise the cheapest vector at a point inside the region is
+            found, and either v is optimal there (and joins K) or that
+            vector is on the envelope but not yet in K, so it joins K and
+            the region is clipped again.  Each vector is thus clipped only
+            against envelope vectors, rather than against all the others. '''
+        size = len(self)
+        if size <= 1: return self
+        d, s, l = self.d, self.s, self.l
+        indices = range(size)
+        switchMid = (switchLo + switchHi) / 2.0
+        lossMid = (lossLo + lossHi) / 2.0
+        order = sorted(indices, key=lambda i: d[i] + s[i] * switchMid + l[i] * lossMid)
+        box = [(lossLo, switchLo), (lossHi, switchLo), (lossHi, switchHi), (lossLo, switchHi)]
+        envelope = []               # K, in the order the vectors were found
+        onEnvelope = [False] * size
+        for i in order:
+            if onEnvelope[i]: continue
+            region = box
+            clipped = 0             # number of vectors of K clipped so far
+            while True:
+                while region and clipped < len(envelope):
+                    j = envelope[clipped]
+                    clipped += 1
+                    # v is no worse than w where
+                    # (d[i] - d[j]) + (l[i] - l[j]) * x + (s[i] - s[j]) * y <= tolerance
+                    region = clipPolygon(region, d[i] - d[j] - tolerance, l[i] - l[j], s[i] - s[j])
+                if not region: break
+                x = sum([vertex[0] for vertex in region]) / len(region)
+                y = sum([vertex[1] for vertex in region]) / len(region)
+                best = min(indices, key=lambda j: d[j] + l[j] * x + s[j] * y)
+                if d[i] + l[i] * x + s[i] * y <= d[best] + l[best] * x + s[best] * y + tolerance:
+                    best = i
+                onEnvelope[best] = True
+                envelope.append(best)
+                if best == i: break
+        return self.select([i for i in indices if onEnvelope[i]])
+
+    def coalesce(self, counting=EXACT):
+        ''' Returns a ParetoFront with duplicate vectors removed and their
+            counts added together.  Vectors are compared on (d, s, l) only,
+            since cospeciations cost nothing; the c entry of the first of
+            several equal vectors is kept. '''
+        c, d, s, l = self.c, self.d, self.s, self.l
+        add = counting.add
+        counts = {}
+        cospeciations = {}
+        for i in range(len(self)):
+            key = (d[i], s[i], l[i])
+            if key not in counts:
+                counts[key] = self.count[i]
+                cospeciations[key] = c[i]
+            else:
+                counts[key] = add(counts[key], self.count[i])
+        output = ParetoFront()
+        for key, count in counts.iteritems():
+            d, s, l = key
+            output.c.append(cospeciations[key])
+            output.d.append(d)
+            output.s.append(s)
+            output.l.append(l)
+            output.count.append(count)
+        return output
+
+    def minimal(self):
+        ''' Returns the vectors that are not dominated in (d, s, l) by any
+            other vector, sorted lexicographically by (d, s, l).  Of several
+            vectors with the same (d, s, l), only the first is kept.  Assumes
+            that the vectors have been coalesced.
+
+            The vectors are swept in lexicographic order, so every vector
+            that could dominate the current one has already been seen.  The
+            (s, l) projections of the vectors kept so far are summarized by
+            a staircase:  parallel lists of s values in increasing order and
+            negated l values in increasing order (that is, l decreasing).
+            The current vector is dominated iff the step with the largest s
+            no greater than its own has an l no greater than its own, which
+            a binary search finds in O(log n) time. '''
+        d, s, l = self.d, self.s, self.l
+        order = sorted(range(len(self)), key=lambda i: (d[i], s[i], l[i]))
+        stairS = []         # s values of the staircase steps, increasing
+        stairL = []         # negated l values of the steps, increasing
+        output = []
+        for i in order:
+            si = s[i]
+            li = l[i]
+            k = bisect_right(stairS, si)
+            if k > 0 and -stairL[k-1] <= li:
+                continue    # dominated by (or equal to) a kept vector
+            output.append(i)
+            # Replace the steps that the new vector dominates in (s, l)
+            k = bisect_left(stairS, si, 0, k)
+            j = bisect_right(stairL, -li, k)
+            stairS[k:j] = [si]
+            stairL[k:j] = [-li]
+        return self.select(output)
+
+
+def clipPolygon(polygon, a, b, c):
+    ''' Clips the given convex polygon, a list of (x, y) vertices, to the
+        half-plane a + b * x + c * y <= 0 and returns the list of vertices
+        of the result, which is empty if nothing is left. '''
+    values = [a + b * x + c * y for x, y in polygon]
+    if max(values) <= 0: return polygon     # entirely inside
+    if min(values) > 0: return []           # entirely outside
+    output = []
+    numVertices = len(polygon)
+    for k in range(numVertices):
+        x1, y1 = polygon[k]
+        f1 = values[k]
+        if f1 <= 0:
+            output.append((x1, y1))
+        f2 = values[k + 1 - numVertices]
+        if (f1 < 0 < f2) or (f2 < 0 < f1):
+            x2, y2 = polygon[k + 1 - numVertices]
+            t = f1 / (f1 - f2)
+            output.append((x1 + t * (x2 - x1), y1 + t * (y2 - y1)))
+    return output
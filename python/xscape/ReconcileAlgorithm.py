@@ -17,14 +17,20 @@
 
 # python libraries
 from collections import *
+import time
 
 # xscape libraries
 from common import *
 from CostVector import *
+from ParetoFront import *
+from CompiledTree import *
+
+HULL_TOLERANCE = 1e-9  # cost difference treated as a tie by hull pruning
 
 class ReconcileAlgorithm(object):
 
-    def __init__(self, switchLo, switchHi, lossLo, lossHi):
+    def __init__(self, switchLo, switchHi, lossLo, lossHi, hullPrune=False,
+                 tolerance=HULL_TOLERANCE, counting=EXACT, switchLimit=None):
 
         # The three dictionaries below correspond to the A, C, and Best DP tables
         # described in the technical report.  These are set to None here but initialized
@@ -34,11 +40,26 @@ class ReconcileAlgorithm(object):
         self.Cmemo = {}
         self.Bestmemo = {}
 
-        # The Ancestors and Descendants dictionaries are precomputed in the reconcile
-        # function and allow the switch function to determine the valid landing sites
-        # for a switch. 
-        self.Ancestors = {}
-        self.Descendants = {}
+        # The Best table is built from two summaries of the C table, described
+        # in the technical report:  Submemo[(ep, eh)] is the Pareto union of the
+        # C table entries for ep on eh and every descendant of eh, and
+        # Outmemo[(ep, eh)] is the Pareto union of those for ep on every edge
+        # that is neither an ancestor nor a descendant of eh.
+        self.Submemo = {}
+        self.Outmemo = {}
+
+        # The compiled host tree is precomputed in the reconcile function.  Its
+        # post-order edge numbering allows the switch function to determine the
+        # valid landing sites for a switch with integer comparisons.
+        self.hostIndex = None
+
+        # An optional SwitchLimit (see switchLimit.py) restricts the landing
+        # sites of switches.  If there is one, switchSites[eh] is the list of
+        # the landing sites of host edge number eh, and the Best table entries
+        # are unions over those sites rather than built from the Sub and Out
+        # tables, which summarize all of the unrestricted landing sites.
+        self.switchLimit = switchLimit
+        self.switchSites = None
 
         # The switchLo, switchHi, lossLo, and lossHi values are the user-specified
         # low and high ranges for the switch and loss costs, relative to the unit
@@ -48,99 +69,172 @@ class ReconcileAlgorithm(object):
         self.lossLo = lossLo
         self.lossHi = lossHi
 
+        # If hullPrune is True, each DP cell keeps only the vectors that are
+        # optimal (to within the tolerance) somewhere in the cost range above.
+        # Costs are additive and linear in the switch and loss costs, so a
+        # sub-solution that is beaten everywhere in the range can't be part of
+        # a solution that is optimal anywhere in it, and the costscape regions
+        # are unchanged.  The vectors that are never optimal are dropped from
+        # the results, however, so this is off by default.
+        self.hullPrune = hullPrune
+        self.tolerance = tolerance
+
+        # How the reconciliations with each vector are counted (see counting.py)
+        self.counting = counting
+
+        # The ParetoFront of the solutions found by the last reconcile, which
+        # is kept along with the DP tables so that zoom can narrow the range.
+        self.solutionFront = None
+
+        # The Profile attached to the algorithm, if any (see profiling.py)
+        self.profile = None
+
     def switches(self, parasiteTree, hostTree, parasiteToHostMapping, ep, eh):
-        ''' Returns the list of all CostVectors in which the given parasite edge ep
-            switches to all possible host edges. '''
+        ''' Returns the ParetoFront of all vectors in which the given parasite edge ep
+            switches to all possible host edges.  The landing sites are eh itself and
+            the edges summarized by the Out table, so this is one Pareto union rather
+            than a scan of the host tree.  With a switch limit, the landing sites
+            are only those the limit allows, and their entries are united directly. '''
                     
         if (ep, eh) in self.Bestmemo: return self.Bestmemo[(ep, eh)]
-        output = []
-        for switchEdge in hostTree:     # for every possible host edge
-            if switchEdge not in self.Ancestors[eh] and \
-               switchEdge not in self.Descendants[eh]:
-                    output.extend(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, ep, switchEdge))
+        if self.switchSites is not None:
+            output = self.paretoUnion([self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, ep, switchEdge) \
+                                       for switchEdge in self.landingSites(eh)])
+        else:
+            output = self.paretoUnion([self.outsideSwitches(parasiteTree, hostTree, parasiteToHostMapping, ep, eh), \
+                                       self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, ep, eh)])
         self.Bestmemo[(ep, eh)] = output
         return output
 
+    def subtreeSwitches(self, parasiteTree, hostTree, parasiteToHostMapping, ep, eh):
+        ''' The Sub table:  the Pareto union of the optimalEdgeCost entries for ep
+            on eh and all of its descendants. '''
 
-    def paretoFilter(self, CVlist):
-        ''' Returns the Pareto front for the given list of CostVectors. '''
-        CVlist = self.CVfilter(CVlist)
-        uniqueCVlist = self.coalesceDuplicates(CVlist)
-        uniqueCVlist.sort(CostVector.lex)
-        if len(uniqueCVlist) == 1: return uniqueCVlist
-        lexlist = [uniqueCVlist[0]]
-        for i in range(1, len(uniqueCVlist)):
-            predecessor = uniqueCVlist[i-1]
-            current = uniqueCVlist[i]
-            if predecessor.d < current.d or predecessor.s < current.s:
-                lexlist.append(current)
-        output = []
-        for v in lexlist:
-            if self.minimal(v, CVlist): output.append(v)
-        return output        
-
-    def CVfilter(self, CVlist):
-        ''' Filter the CVlist to a subset that removes those cost vectors that
-            cannot be optimal in the given cost range. '''
-                    
-        if CVlist == []: return []
+        if (ep, eh) in self.Submemo: return self.Submemo[(ep, eh)]
+        if self.tipEdge(eh, hostTree):
+            output = self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, ep, eh)
         else:
-            LUB = min([cv.d + cv.s * self.switchHi + cv.l * self.lossHi for cv in CVlist])
-            output = []
-            for cv in CVlist:
-                mincost = cv.d + cv.l * self.lossLo + cv.s * self.switchLo 
-                if mincost <= LUB:
-                    output.append(cv)
-            return output
-                
-    def coalesceDuplicates(self, CVlist):
-        ''' Takes a cost vector list as input and returns a list with duplicates
-            removed and with event counts updated accordingly. '''
-        counts = {}
-        for cv in CVlist:
-            cvtup = cv.toTupleCDSL()
-            count = cv.count
-            if cvtup not in counts:
-                counts[cvtup] = count
-            else:
-                counts[cvtup] = counts[cvtup] + count
-        output = []
-        for entry in counts:
-            entryWithCounts = entry + (counts[entry],)
-            output.append(self.tupleToCV(entryWithCounts))
+            output = self.paretoUnion([ \
+                self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, ep, eh), \
+                self.subtreeSwitches(parasiteTree, hostTree, parasiteToHostMapping, ep, self.leftChildEdge(eh, hostTree)), \
+                self.subtreeSwitches(parasiteTree, hostTree, parasiteToHostMapping, ep, self.rightChildEdge(eh, hostTree))])
+        self.Submemo[(ep, eh)] = output
         return output
 
-    def tupleToCV(self, entry):
-        return CostVector(entry[0], entry[1], entry[2], entry[3], entry[4])
-
-    def minimal(self, v, CVlist):
-        ''' Returns True if v is a minimal element of the CostVector list. '''
-        for w in CVlist:
-            if w < v: return False
-        return True
-
-    def descendants(self, edge, tree):
-        ''' returns the list of descendant edges of the given edge in the
-            given tree.'''
-        if self.tipEdge(edge, tree): return []
-        else: return [self.leftChildEdge(edge, tree), self.rightChildEdge(edge, tree)] + \
-                      self.descendants(self.leftChildEdge(edge, tree), tree) + \
-                      self.descendants(self.rightChildEdge(edge, tree), tree)
-                      
-    def ancestorsAndDescendants(self, tree):
-        ''' Returns a two dictionaries D and A, where D[e] is the list
-            of descendant edges of e and A[e] is the list of ancestral edges
-            of e. '''
-        
-        # First, compute all the descendants
-        for e in tree:
-            self.Descendants[e] = self.descendants(e, tree)
-        # Next, compute ancestors 
-        for e in tree: self.Ancestors[e] = []  # initialize A dictionary      
-        for e in tree:
-            for d in self.Descendants[e]: # d descendant of e => e ancestor of d
-                self.Ancestors[d].append(e)
-            
+    def outsideSwitches(self, parasiteTree, hostTree, parasiteToHostMapping, ep, eh):
+        ''' The Out table:  the Pareto union of the optimalEdgeCost entries for ep
+            on all the edges that are neither ancestors nor descendants of eh.  These
+            are the edges outside the parent of eh, plus the subtree of the sibling
+            of eh. '''
+
+        if (ep, eh) in self.Outmemo: return self.Outmemo[(ep, eh)]
+        hostIndex = self.hostIndex
+        e = hostIndex.index[eh]
+        if hostIndex.parent[e] == NONE:
+            output = ParetoFront()
+        else:
+            parent = hostIndex.names[hostIndex.parent[e]]
+            sibling = hostIndex.names[hostIndex.sibling(e)]
+            output = self.paretoUnion([ \
+                self.outsideSwitches(parasiteTree, hostTree, parasiteToHostMapping, ep, parent), \
+                self.subtreeSwitches(parasiteTree, hostTree, parasiteToHostMapping, ep, sibling)])
+        self.Outmemo[(ep, eh)] = output
+        return output
+
+
+    def reconcileAnytime(self, parasiteTree, hostTree, phi, seconds=None, patience=None):
+        ''' Runs placements (see the engines) until the root of the parasite
+            tree has been placed on every host edge, the given number of
+            seconds has passed, or the solutions have not changed for the
+            given number of placements in a row, whichever comes first.
+            Returns a pair (CVlist, finished), where CVlist is the list of
+            Pareto optimal solutions among the placements done and finished
+            is True if every placement was done.  The time is checked between
+            placements, and the table entries that later placements share are
+            filled in by the first, so the first placement may take much
+            longer than the rest. '''
+        startTime = time.time()
+        CVlist = []
+        placed = 0
+        unchanged = 0
+        for hostEdge, newCVlist in self.placements(parasiteTree, hostTree, phi):
+            placed += 1
+            if [CV.toTupleCDSLCount() for CV in newCVlist] == [CV.toTupleCDSLCount() for CV in CVlist]:
+                unchanged += 1
+            else:
+                unchanged = 0
+            CVlist = newCVlist
+            if (patience is not None and unchanged >= patience) or \
+               (seconds is not None and time.time() - startTime >= seconds):
+                return CVlist, placed == len(hostTree)
+        return CVlist, True
+
+    def zoom(self, switchLo, switchHi, lossLo, lossHi):
+        ''' Narrows the range of switch and loss costs to the given one, which
+            must lie within the current range, and returns the list of Pareto
+            optimal solutions for it.  A vector that is optimal somewhere in
+            the new range can only be built from sub-solutions that are too,
+            so the solutions are found by filtering those of the last
+            reconcile rather than by running the DP again.
+            The vectors that are optimal somewhere in the new range, and their
+            counts, are those the DP would give;  since paretoFilter removes
+            vectors by a bound on their costs rather than exactly, either may
+            keep a few more vectors that are not. '''
+        if self.solutionFront is None:
+            raise ValueError("zoom needs the results of a reconcile")
+        if not (self.switchLo <= switchLo <= switchHi <= self.switchHi and
+                self.lossLo <= lossLo <= lossHi <= self.lossHi):
+            raise ValueError("the zoomed cost range must lie within the current one")
+        self.switchLo = switchLo
+        self.switchHi = switchHi
+        self.lossLo = lossLo
+        self.lossHi = lossHi
+        self.solutionFront = self.paretoFilter(self.solutionFront)
+        return self.solutionFront.toCostVectors(self.counting)
+
+    def paretoFilter(self, front):
+        ''' Returns the Pareto front for the given ParetoFront:  its vectors
+            that may be optimal in the given cost range, with duplicates
+            coalesced and dominated vectors removed.  With hull pruning, only
+            the vectors that are optimal somewhere in the range are kept. '''
+        front = front.boxFilter(self.switchLo, self.switchHi, self.lossLo, self.lossHi)
+        front = front.coalesce(self.counting).minimal()
+        if self.hullPrune:
+            front = front.hullFilter(self.switchLo, self.switchHi, self.lossLo, self.lossHi,
+                                     self.tolerance)
+        return front
+
+    def paretoUnion(self, fronts):
+        ''' Returns the Pareto front of the union of the given ParetoFronts, with
+            duplicates coalesced and dominated vectors removed.  Unlike paretoFilter,
+            no vectors are removed for their costs, so a union of unions is the
+            same as the union of all the fronts. '''
+        return ParetoFront.concat(fronts).coalesce(self.counting).minimal()
+
+    def compileHostTree(self, hostTree):
+        ''' Sets self.hostIndex to the compiled host tree, whose edge
+            numbering answers ancestor and descendant queries, and finds the
+            landing sites allowed by the switch limit, if any. '''
+        self.hostIndex = CompiledTree(hostTree)
+        self.switchSites = self.allowedLandingSites(self.hostIndex)
+
+    def allowedLandingSites(self, host):
+        ''' Returns the list of the landing sites allowed by the switch limit
+            for each edge of the CompiledTree host, or None if there is no
+            switch limit. '''
+        if self.switchLimit is None: return None
+        return self.switchLimit.allLandingSites(host)
+
+    def landingSites(self, eh):
+        ''' Returns the list of host edges to which a parasite edge on host
+            edge eh may switch:  those that are neither ancestors nor
+            descendants of eh, and are allowed by the switch limit. '''
+        hostIndex = self.hostIndex
+        e = hostIndex.index[eh]
+        if self.switchSites is not None:
+            return [hostIndex.names[x] for x in self.switchSites[e]]
+        return [hostIndex.names[x] for x in hostIndex.landingSites(e)]
+
     def tipEdge(self, edge, tree):
         ''' returns True if the edge terminates at a tip  '''
         return self.leftChildEdge(edge, tree) == None  # This edge has no edge children
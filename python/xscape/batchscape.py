@@ -0,0 +1 @@
+../../bin/batchscape
\ No newline at end of file
@@ -0,0 +1,110 @@
+# checkpoint.py
+# On-disk checkpoints of DP table rows for long reconciliation runs
+
+# A checkpoint file is a stream of pickled records.  The first record is a
+# header that identifies the run (the trees, tip associations, and options),
+# so that a checkpoint is never resumed with different inputs.  Each record
+# after that holds the finished rows of one parasite edge, in the order in
+# which they were computed.  ParetoFronts pickle as their column arrays, so
+# the rows are stored compactly.
+
+# Records are buffered and written out every so many rows and/or every so
+# many seconds.  If a run is killed while a record is being written, the
+# incomplete record at the end of the file is ignored on resume.
+
+# python libraries
+import cPickle as pickle
+import os
+import time
+
+FORMAT = ("xscape checkpoint", 1)   # identifies the file format and version
+
+class Checkpoint(object):
+
+    def __init__(self, fileName, rows=None, seconds=None):
+        ''' Sets up a checkpoint in the given file.  Buffered records are
+            written out after the given number of rows or the given number
+            of seconds, whichever comes first;  if neither is given, every
+            row is written out at once. '''
+        self.fileName = fileName
+        self.header = None
+        self.rows = rows
+        self.seconds = seconds
+        self.buffer = []
+        self.lastWrite = time.time()
+        self.fileHandle = None
+
+    def open(self, header, resume=False):
+        ''' Opens the checkpoint for the run identified by the given header,
+            which must be picklable.  A generator:  if resume is True, yields
+            the records saved in the checkpoint file one at a time, so they
+            need not all be in memory at once, and once they are all read
+            continues the file from there;  otherwise, or if there is no
+            checkpoint file, starts a new file and yields nothing.  Raises
+            ValueError if the file is a checkpoint for a different run. '''
+        self.header = (FORMAT, header)
+        if not resume or not os.path.exists(self.fileName):
+            self.start()
+            return
+        fileHandle = open(self.fileName, "rb")
+        try:
+            try:
+                header = pickle.load(fileHandle)
+            except Exception:
+                header = None       # killed while writing the header
+            if header is None:
+                end = None
+            elif header != self.header:
+                raise ValueError("%s is a checkpoint for a different run" % self.fileName)
+            else:
+                while True:
+                    end = fileHandle.tell()     # after the last complete record
+                    try:
+                        record = pickle.load(fileHandle)
+                    except Exception:
+                        break       # end of file, or an incomplete record
+                    yield record
+        finally:
+            fileHandle.close()
+
+        if end is None:
+            self.start()
+            return
+        # Continue the file after the last complete record
+        self.fileHandle = open(self.fileName, "r+b")
+        self.fileHandle.truncate(end)
+        self.fileHandle.seek(end)
+
+    def start(self):
+        ''' Starts a new checkpoint file, replacing any old one. '''
+        self.fileHandle = open(self.fileName, "wb")
+        pickle.dump(self.header, self.fileHandle, pickle.HIGHEST_PROTOCOL)
+        self.flush()
+
+    def save(self, record):
+        ''' Adds a record to the checkpoint, writing out the buffered records
+            if it is time to. '''
+        self.buffer.append(record)
+        if (self.rows is None and self.seconds is None) or \
+           (self.rows is not None and len(self.buffer) >= self.rows) or \
+           (self.seconds is not None and time.time() - self.lastWrite >= self.seconds):
+            self.write()
+
+    def write(self):
+        ''' Writes out the buffered records. '''
+        for record in self.buffer:
+            pickle.dump(record, self.fileHandle, pickle.HIGHEST_PROTOCOL)
+        self.buffer = []
+        self.flush()
+
+    def flush(self):
+        self.fileHandle.flush()
+        os.fsync(self.fileHandle.fileno())
+        self.lastWrite = time.time()
+
+    def close(self):
+        ''' Writes out the buffered records and closes the file. '''
+        if self.fileHandle is not None:
+            self.write()
+            self.fileHandle.close()
+            self.fileHandle = None
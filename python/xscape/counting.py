@@ -0,0 +1,63 @@
+# counting.py
+# Ways of counting the reconciliations with each cost vector
+
+# The DP counts the reconciliations with each cost vector by multiplying the
+# counts of the sub-solutions it combines and adding the counts of equal
+# vectors.  Exact counts are Python integers, which on large trees grow to
+# thousands of digits, and then the arithmetic on them dominates the run
+# time.  Two cheaper ways of counting are offered:
+#
+#   LOG:         counts are carried as the natural logarithms of the exact
+#                counts, as floats, so that multiplying counts is adding logs
+#   SATURATING:  counts are exact up to 2^63 - 1, and stop there, so that
+#                they stay machine-sized integers
+#
+# A Counting gives the count of a single reconciliation, the functions used
+# to multiply and add counts, and the label with which its counts are shown,
+# so that log counts are not mistaken for counts.
+
+# python libraries
+import math
+import operator
+
+SATURATION = 2 ** 63 - 1    # largest count in saturating mode
+
+class Counting(object):
+
+    def __init__(self, name, one, multiply, add, label="Count"):
+        self.name = name            # as given on the command line
+        self.one = one              # the count of a single reconciliation
+        self.multiply = multiply    # multiplies two counts
+        self.add = add              # adds two counts
+        self.label = label          # shown before the counts in the output
+
+    def __repr__(self):
+        return "Counting(" + repr(self.name) + ")"
+
+    def __reduce__(self):
+        # Countings are compared by identity, so they unpickle as themselves
+        return (countingByName, (self.name,))
+
+
+def logAdd(x, y):
+    ''' Returns log(exp(x) + exp(y)) without overflow. '''
+    if x < y: x, y = y, x
+    return x + math.log1p(math.exp(y - x))
+
+def saturatingMultiply(x, y):
+    return min(x * y, SATURATION)
+
+def saturatingAdd(x, y):
+    return min(x + y, SATURATION)
+
+EXACT = Counting("exact", 1, operator.mul, operator.add)
+LOG = Counting("log", 0.0, operator.add, logAdd, "log Count")
+SATURATING = Counting("saturating", 1, saturatingMultiply, saturatingAdd)
+
+COUNTINGS = [EXACT, LOG, SATURATING]
+
+def countingByName(name):
+    ''' Returns the Counting with the given name. '''
+    for counting in COUNTINGS:
+        if counting.name == name: return counting
+    raise ValueError("unknown counting mode: " + repr(name))
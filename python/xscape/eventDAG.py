@@ -0,0 +1,365 @@
+# eventDAG.py
+# Shared storage for the events of the partial solutions in eventscape
+
+# The events DP (see reconcileEvents.py) records, for every partial solution
+# it builds, the set of events used by that solution and by every solution
+# below it.  Stored as explicit sets, every DP cell holds a copy of the
+# events below it, so the memory and time used grow quadratically with the
+# size of the trees.  An EventDAG instead stores each event once, as a node
+# with pointers to the partial solutions it was built from, and these are
+# shared by all the solutions built on them.  The set of events of a
+# solution is the set of event nodes reachable from it, and is only found
+# when it is asked for, which eventscape does just for the optimal cost
+# vectors of the whole reconciliation.
+
+# The keys are those used by reconcileEvents:
+#
+#   ns:    (ep, eh, c, d, s, l), a partial solution for ep on eh with cost
+#          vector <c, d, s, l>
+#   nswe:  (ep, eh, eventType, c, d, s, l), the event that a partial
+#          solution ns starts with
+#
+# An ns is reached by every nswe that is recorded for it, and an nswe
+# reaches the partial solutions of each of the ways it was built:  a
+# cospeciation, duplication or switch from a pair of them, or a loss from
+# one.  A partial solution with no events is a tip association.  The DAG
+# therefore holds every optimal reconciliation, and each of them can be
+# found by choosing one event and one way of building it at every ns,
+# starting from the solutions for pTop (see reconciliations).
+
+# The number of reconciliations of each ns is found bottom-up, as in the DP:
+# the sum over its events and their ways of being built of the product of
+# the counts of the parts.  The number of the reconciliations of a set of
+# roots that use each event (its support) is then found top-down, by
+# passing to each part the count of the ways of completing the rest of a
+# reconciliation above and beside it (see support).  Both passes visit each
+# way of building each event once, so the time taken is proportional to the
+# DAG, and so to the DP tables, whatever the number of reconciliations.
+
+# A DAG may be written to a JSON file (see write) for other tools to query
+# without running the DP again:
+#
+#   {"format": ["xscape reconciliation graph", 1],
+#    "solutions": [[ep, eh, c, d, s, l], ...],
+#    "events": [[[ep, eh, eventType, c, d, s, l], solution, [[part, ...], ...]], ...],
+#    "roots": [solution, ...]}
+#
+# where solutions are numbered by their position in "solutions", events by
+# their position in "events", each event names its partial solution and
+# lists the parts of each of the ways it was built, and the roots are the
+# solutions for pTop that the writer chose (eventscape gives those with the
+# optimal cost vectors).  Edges are written as lists of vertex names, or as
+# strings for the pTop edge.
+
+# Each event is numbered when it is first recorded, and a set of events is
+# a bitmask:  a Python integer whose bit i is set if event number i is in
+# the set.  Unions and intersections of sets are then bitwise operations on
+# whole machine words at a time, and the event tuples are only looked up
+# (decoded) when they are written out.
+
+# python libraries
+import binascii
+import json
+from collections import *
+
+# xscape libraries
+from counting import *
+
+FORMAT = ["xscape reconciliation graph", 1]   # identifies the file format and version
+
+class EventDAG(object):
+
+    def __init__(self):
+        self.nodes = {}                     # ns -> the one shared copy of it
+        self.eventIDs = {}                  # nswe -> its event number
+        self.events = []                    # event number -> nswe
+        self.children = []                  # event number -> the tuples of ns it was built from
+        self.solutions = defaultdict(list)  # ns -> the numbers of its events
+        self.version = 0                    # changes whenever the DAG does
+
+    def add(self, nswe, ns, parts):
+        ''' Records that event nswe of partial solution ns was built from the
+            given list of partial solutions.  Returns the number of nswe and
+            the number of ways it has been built so far, which together
+            identify its set of events as it is now. '''
+        self.version += 1
+        event = self.eventIDs.get(nswe)
+        if event is None:
+            event = len(self.events)
+            self.eventIDs[nswe] = event
+            self.events.append(nswe)
+            self.children.append([])
+            self.solutions[self.nodes.setdefault(ns, ns)].append(event)
+        children = self.children[event]
+        children.append(tuple([self.nodes.setdefault(part, part) for part in parts]))
+        return event, len(children)
+
+    def mask(self, roots):
+        ''' Takes a list of pairs (event, size), where size is a number of
+            the ways that the event was built, and returns the bitmask of the
+            events reachable from the given events through the first size of
+            those ways.  Uses an explicit
+            stack so that deep trees do not exhaust the recursion limit. '''
+        bits = bytearray((len(self.events) + 7) // 8)
+        expanded = bytearray(len(self.events))  # events whose parts are all stacked
+        seen = set()                            # ns already visited
+        stack = []
+        for event, size in roots:
+            bits[event >> 3] |= 1 << (event & 7)
+            for parts in self.children[event][:size]:
+                stack.extend(parts)
+        while stack:
+            ns = stack.pop()
+            if ns in seen: continue
+            seen.add(ns)
+            for event in self.solutions.get(ns, ()):
+                if not expanded[event]:
+                    expanded[event] = 1
+                    bits[event >> 3] |= 1 << (event & 7)
+                    for parts in self.children[event]:
+                        stack.extend(parts)
+        return bytesToMask(bits)
+
+    def eventMask(self, nswe):
+        ''' Returns the bitmask of the events of the solutions that start
+            with the event nswe. '''
+        event = self.eventIDs.get(nswe)
+        if event is None: return 0
+        return self.mask([(event, len(self.children[event]))])
+
+    def solutionMask(self, ns):
+        ''' Returns the bitmask of the events of the partial solutions ns. '''
+        return self.mask([(event, len(self.children[event]))
+                          for event in self.solutions.get(ns, ())])
+
+    def decode(self, mask):
+        ''' Returns the list of the events (nswe) in the given bitmask, in
+            the order in which they were first recorded. '''
+        return [self.events[event] for event in maskToIDs(mask)]
+
+    def order(self, roots):
+        ''' Returns the list of the ns reachable from the given list of ns,
+            each after all of the ns it is built from.  Uses an explicit
+            stack so that deep trees do not exhaust the recursion limit. '''
+        output = []
+        seen = set()
+        stack = [(root, False) for root in roots if root in self.nodes]
+        while stack:
+            ns, finished = stack.pop()
+            if finished:
+                output.append(ns)
+                continue
+            if ns in seen: continue
+            seen.add(ns)
+            stack.append((ns, True))
+            for event in self.solutions.get(ns, ()):
+                for parts in self.children[event]:
+                    for part in parts:
+                        if part not in seen: stack.append((part, False))
+        return output
+
+    def counts(self, order, counting=EXACT):
+        ''' Takes a list of ns as returned by order and returns the
+            dictionary of the number of reconciliations of each, counted as
+            given (see counting.py). '''
+        output = {}
+        for ns in order:
+            if ns not in self.solutions:        # a tip association
+                output[ns] = counting.one
+                continue
+            total = None
+            for event in self.solutions[ns]:
+                for parts in self.children[event]:
+                    product = counting.one
+                    for part in parts:
+                        product = counting.multiply(product, output[part])
+                    if total is None: total = product
+                    else: total = counting.add(total, product)
+            output[ns] = total
+        return output
+
+    def support(self, roots, counting=EXACT):
+        ''' Returns a pair (total, support), where total is the number of
+            reconciliations of the given list of ns and support is the
+            dictionary of the number of them that use each event, by event
+            number, for the events that any of them use. '''
+        roots = [root for root in set(roots) if root in self.nodes]
+        order = self.order(roots)
+        inside = self.counts(order, counting)
+        outside = {}    # ns -> the number of ways of completing it to a reconciliation
+        for root in roots:
+            outside[root] = counting.one
+        support = {}
+        for ns in reversed(order):
+            above = outside[ns]
+            for event in self.solutions.get(ns, ()):
+                eventCount = None
+                for parts in self.children[event]:
+                    counts = [inside[part] for part in parts]
+                    product = counting.one
+                    for count in counts:
+                        product = counting.multiply(product, count)
+                    if eventCount is None: eventCount = product
+                    else: eventCount = counting.add(eventCount, product)
+                    for i, part in enumerate(parts):
+                        beside = above
+                        for j, count in enumerate(counts):
+                            if j != i: beside = counting.multiply(beside, count)
+                        if part in outside: outside[part] = counting.add(outside[part], beside)
+                        else: outside[part] = beside
+                support[event] = counting.multiply(above, eventCount)
+        total = None
+        for root in roots:
+            if total is None: total = inside[root]
+            else: total = counting.add(total, inside[root])
+        return total, support
+
+    def reconciliations(self, roots):
+        ''' Generates every reconciliation of each of the given partial
+            solutions (ns) in turn, as the list of its events (nswe) from the
+            root down.  Their number is the count of the cost vector, so this
+            is only practical for small counts.  Uses an explicit stack of
+            the partial reconciliations and the ns still to be expanded in
+            them, so that deep trees do not exhaust the recursion limit. '''
+        stack = [([], [root]) for root in reversed(roots) if root in self.nodes]
+        while stack:
+            events, pending = stack.pop()
+            if not pending:
+                yield events
+                continue
+            ns = pending[-1]
+            rest = pending[:-1]
+            if ns not in self.solutions:        # a tip association
+                stack.append((events, rest))
+                continue
+            for event in reversed(self.solutions[ns]):
+                nswe = self.events[event]
+                for parts in reversed(self.children[event]):
+                    stack.append((events + [nswe], rest + list(parts)))
+
+    def write(self, fileName, roots=()):
+        ''' Writes the DAG, with the given list of ns as its roots, to the
+            given file as JSON (see the top of this file). '''
+        numbers = {}
+        solutions = []
+        for ns in self.nodes:
+            numbers[ns] = len(solutions)
+            solutions.append(ns)
+        events = []
+        for event, nswe in enumerate(self.events):
+            ns = nswe[:2] + nswe[3:]
+            events.append([nswe, numbers[ns],
+                           [[numbers[part] for part in parts] for parts in self.children[event]]])
+        fileHandle = open(fileName, "w")
+        try:
+            json.dump({"format": FORMAT,
+                       "solutions": solutions,
+                       "events": events,
+                       "roots": [numbers[ns] for ns in roots if ns in numbers]},
+                      fileHandle, separators=(",", ":"))
+            fileHandle.write("\n")
+        finally:
+            fileHandle.close()
+
+
+def readEventDAG(fileName):
+    ''' Reads a DAG written by EventDAG.write and returns a pair (dag,
+        roots), where roots is the list of its root ns.  Raises ValueError if
+        the file is not a reconciliation graph. '''
+    fileHandle = open(fileName, "r")
+    try:
+        graph = json.load(fileHandle)
+    finally:
+        fileHandle.close()
+    if not isinstance(graph, dict) or graph.get("format") != FORMAT:
+        raise ValueError("%s is not an xscape reconciliation graph" % fileName)
+    solutions = [jsonKey(ns, 2) for ns in graph["solutions"]]
+    dag = EventDAG()
+    for ns in solutions:
+        dag.nodes[ns] = ns
+    for nswe, solution, alternatives in graph["events"]:
+        nswe = jsonKey(nswe, 2)
+        for parts in alternatives:
+            dag.add(nswe, solutions[solution], [solutions[part] for part in parts])
+    return dag, [solutions[root] for root in graph["roots"]]
+
+def jsonKey(key, edges):
+    ''' Returns the ns or nswe key read from JSON as the given list, whose
+        first edges entries are edges (with their vertex names as lists). '''
+    return tuple([jsonText(e) if isinstance(e, basestring) else tuple([jsonText(v) for v in e])
+                  for e in key[:edges]] +
+                 [jsonText(x) if isinstance(x, basestring) else x for x in key[edges:]])
+
+def jsonText(text):
+    ''' Returns the given string read from JSON as the (UTF-8) str it was
+        written from. '''
+    return text.encode("utf-8")
+
+
+class EventSets(object):
+    ''' A read-only dictionary of sets of events, found by the given
+        function (returning a bitmask) of the key when first asked for and
+        kept until the EventDAG changes.  Missing keys give empty sets, as in
+        a defaultdict(set). '''
+
+    def __init__(self, dag, function):
+        self.dag = dag
+        self.function = function
+        self.cache = {}
+        self.version = dag.version
+
+    def __getitem__(self, key):
+        if self.version != self.dag.version:
+            self.cache = {}
+            self.version = self.dag.version
+        if key not in self.cache:
+            self.cache[key] = set(self.dag.decode(self.function(key)))
+        return self.cache[key]
+
+
+def bytesToMask(bits):
+    ''' Returns the bitmask whose bit 8i + j is bit j of byte i of the given
+        bytearray. '''
+    if not bits: return 0
+    return int(binascii.hexlify(str(bits[::-1])), 16)
+
+def idsToMask(ids):
+    ''' Returns the bitmask with the bits of the given numbers set. '''
+    if not ids: return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        bits[i >> 3] |= 1 << (i & 7)
+    return bytesToMask(bits)
+
+def maskToIDs(mask):
+    ''' Returns the list of the numbers of the bits set in the given bitmask,
+        in increasing order. '''
+    if not mask: return []
+    digits = "%x" % mask
+    if len(digits) % 2: digits = "0" + digits
+    output = []
+    for i, byte in enumerate(bytearray(binascii.unhexlify(digits)[::-1])):
+        if byte:
+            for j in range(8):
+                if byte >> j & 1: output.append(8 * i + j)
+    return output
+
+def addCount(counters, mask):
+    ''' Adds one to the count of every event in the given bitmask.  The
+        counts are kept bit-sliced:  bit i of counters[k] is bit k of the
+        count of event i, so every event is counted at once. '''
+    carry = mask
+    for k in range(len(counters)):
+        if not carry: return
+        counters[k], carry = counters[k] ^ carry, counters[k] & carry
+    if carry: counters.append(carry)
+
+def countMask(counters, count, universe):
+    ''' Returns the bitmask of the events in the bitmask universe whose count
+        in the given bit-sliced counters (see addCount) is the given count. '''
+    if count >> len(counters): return 0
+    mask = universe
+    for k, counter in enumerate(counters):
+        if count >> k & 1: mask &= counter
+        else: mask &= ~counter
+    return mask
@@ -0,0 +1,219 @@
+# profiling.py
+# Counters and timings for finding where the time goes in a reconciliation
+
+# A Profile is attached to a reconciliation algorithm (any of the engines
+# derived from ReconcileAlgorithm) before it is run.  Attaching wraps the
+# algorithm's table, merge, and filter methods in instance attributes that
+# record what they do, and leaves the class untouched, so an algorithm that
+# is not profiled runs exactly the same code as before and pays nothing.
+#
+# The report holds, for each DP table:
+#
+#   calls, hits:   the number of calls, and of those answered from the memo
+#                  (for the memoized engines; the bottom-up engines compute
+#                  every cell exactly once)
+#   seconds:       the time spent in the table's own code, not counting the
+#                  time spent in the other tables and filters it calls
+#   sizes:         a histogram of the sizes of the fronts it produced
+#
+# and histograms of the numbers of vectors going into and out of the Pareto
+# filters and unions, of the sizes of the cross products of the merges
+# (before any pruning), and of the numbers of switch landing sites covered
+# by each Best table entry.  Histogram buckets are powers of two:  "4-7"
+# counts the sizes from 4 to 7.  The parallel engine's worker processes
+# inherit the attached Profile and send their counters back with the rows
+# of each task, so the report covers their work too;  their seconds are
+# summed over the workers, and so may add up to more than the elapsed time.
+
+# python libraries
+import json
+import time
+from collections import defaultdict
+
+# xscape libraries
+from ParetoFront import *
+
+# The methods that compute DP table entries:  method name -> (table, memo
+# attribute).  Memoized methods take the parasite and host edges as their
+# last two arguments and look them up in the memo attribute.
+TABLES = {"aliveEdgeCost": ("A", "Amemo"),
+          "A": ("A", "Amemo"),
+          "optimalEdgeCost": ("C", "Cmemo"),
+          "C": ("C", "Cmemo"),
+          "switches": ("Best", "Bestmemo"),
+          "allSwitches": ("Best", "Bestmemo"),
+          "BestRow": ("Best", None),
+          "subtreeSwitches": ("Sub", "Submemo"),
+          "outsideSwitches": ("Out", "Outmemo")}
+
+class Profile(object):
+
+    def __init__(self):
+        self.calls = defaultdict(int)           # table -> calls
+        self.hits = defaultdict(int)            # table -> memo hits
+        self.seconds = defaultdict(float)       # table or step -> own time
+        self.histograms = defaultdict(lambda: defaultdict(int))
+        self.stack = []                         # [name, time in callees]
+        self.totalSeconds = 0.0
+        self.siteCounts = None                  # (host, sites, landing sites of each edge)
+
+    def attach(self, algorithm):
+        ''' Instruments the given reconciliation algorithm, which keeps the
+            Profile as its profile attribute.  Returns the Profile, for
+            convenience. '''
+        algorithm.profile = self
+        for name, (table, memo) in TABLES.iteritems():
+            if hasattr(algorithm, name):
+                setattr(algorithm, name, self.tableWrapper(algorithm, getattr(algorithm, name),
+                                                           name, table, memo))
+        for name in ("paretoFilter", "paretoUnion"):
+            setattr(algorithm, name, self.filterWrapper(getattr(algorithm, name), name))
+        if hasattr(algorithm, "merge"):
+            algorithm.merge = self.mergeWrapper(algorithm.merge)
+        reconcile = algorithm.reconcile
+        def timedReconcile(*args, **kwargs):
+            startTime = time.time()
+            try:
+                return reconcile(*args, **kwargs)
+            finally:
+                self.totalSeconds += time.time() - startTime
+        algorithm.reconcile = timedReconcile
+        return self
+
+    def count(self, histogram, size):
+        ''' Adds one to the bucket for the given size in the given histogram. '''
+        if size == 0:
+            bucket = "0"
+        else:
+            bits = size.bit_length()
+            bucket = "%d-%d" % (1 << (bits - 1), (1 << bits) - 1)
+        self.histograms[histogram][bucket] += 1
+
+    def timed(self, name, function, args, kwargs):
+        ''' Calls the function, adding its own time (less that of the timed
+            calls it makes) to the given name. '''
+        self.stack.append([name, 0.0])
+        startTime = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.time() - startTime
+            name, inner = self.stack.pop()
+            self.seconds[name] += elapsed - inner
+            if self.stack:
+                self.stack[-1][1] += elapsed
+
+    def tableWrapper(self, algorithm, method, name, table, memo):
+        def wrapper(*args, **kwargs):
+            self.calls[table] += 1
+            memoTable = getattr(algorithm, memo) if memo is not None else None
+            if isinstance(memoTable, dict) and tuple(args[-2:]) in memoTable:
+                self.hits[table] += 1
+                return memoTable[tuple(args[-2:])]
+            output = self.timed(table, method, args, kwargs)
+            if table == "Best":
+                self.countLandingSites(algorithm, name, args)
+            if isinstance(output, ParetoFront):
+                self.count(table, len(output))
+            else:                               # a Best table row or list
+                for entry in output:
+                    if isinstance(entry, ParetoFront): self.count(table, len(entry))
+                    else: self.count(table, len(entry[1]))
+            return output
+        return wrapper
+
+    def filterWrapper(self, method, name):
+        def wrapper(front, *args, **kwargs):
+            if name == "paretoFilter":
+                self.count("paretoFilter in", len(front))
+            else:
+                self.count("paretoUnion in", sum([len(f) for f in front]))
+            output = self.timed(name, method, (front,) + args, kwargs)
+            self.count(name + " out", len(output))
+            return output
+        return wrapper
+
+    def mergeWrapper(self, method):
+        def wrapper(front1, front2, *args, **kwargs):
+            self.count("merge pairs", len(front1) * len(front2))
+            output = self.timed("merge", method, (front1, front2) + args, kwargs)
+            self.count("merge out", len(output))
+            return output
+        return wrapper
+
+    def countLandingSites(self, algorithm, name, args):
+        ''' Counts the landing sites covered by the Best table entries just
+            computed by the named method with the given arguments:  the
+            whole row for BestRow, and the entry for the host edge named by
+            the last argument otherwise. '''
+        host = getattr(algorithm, "hostIndex", None)
+        if host is None: host = algorithm.host
+        sites = algorithm.switchSites
+        if self.siteCounts is None or self.siteCounts[0] is not host or \
+           self.siteCounts[1] is not sites:
+            if sites is None:
+                counts = [len(host.landingSites(e)) for e in range(len(host))]
+            else:
+                counts = [len(edges) for edges in sites]
+            self.siteCounts = (host, sites, counts)
+        counts = self.siteCounts[2]
+        if name == "BestRow":
+            for count in counts:
+                self.count("landing sites", count)
+        else:
+            self.count("landing sites", counts[host.index[args[-1]]])
+
+    def reset(self):
+        ''' Clears the counters and timings, e.g. in a worker process of the
+            parallel engine before each task. '''
+        self.calls.clear()
+        self.hits.clear()
+        self.seconds.clear()
+        self.histograms.clear()
+        del self.stack[:]
+
+    def counters(self):
+        ''' Returns the counters and timings as plain dictionaries, which can
+            be sent between processes and added with addCounters. '''
+        return (dict(self.calls), dict(self.hits), dict(self.seconds),
+                dict((name, dict(histogram)) for name, histogram in self.histograms.iteritems()))
+
+    def addCounters(self, counters):
+        ''' Adds counters returned by the counters method (of the copy of
+            the Profile in another process) to this Profile's. '''
+        calls, hits, seconds, histograms = counters
+        for table, value in calls.iteritems(): self.calls[table] += value
+        for table, value in hits.iteritems(): self.hits[table] += value
+        for name, value in seconds.iteritems(): self.seconds[name] += value
+        for name, histogram in histograms.iteritems():
+            for bucket, value in histogram.iteritems():
+                self.histograms[name][bucket] += value
+
+    def report(self):
+        ''' Returns the profile as a dictionary, ready to be written as
+            JSON. '''
+        tables = {}
+        for table in set(self.calls.keys()):
+            tables[table] = {"calls": self.calls[table],
+                             "hits": self.hits[table],
+                             "seconds": self.seconds[table],
+                             "sizes": dict(self.histograms[table])}
+        histograms = {}
+        for name, histogram in self.histograms.iteritems():
+            if name not in tables: histograms[name] = dict(histogram)
+        steps = {}
+        for name in ("paretoFilter", "paretoUnion", "merge"):
+            if name in self.seconds: steps[name] = self.seconds[name]
+        return {"seconds": self.totalSeconds,
+                "tables": tables,
+                "steps": steps,
+                "histograms": histograms}
+
+    def write(self, fileName):
+        ''' Writes the report to the given file as JSON. '''
+        fileHandle = open(fileName, "w")
+        try:
+            json.dump(self.report(), fileHandle, indent=2, sort_keys=True)
+            fileHandle.write("\n")
+        finally:
+            fileHandle.close()
@@ -0,0 +1,35 @@
+# randomTrees.py
+# Random trees, for the benchmarks and checks
+
+# python libraries
+import random
+
+def randomTree(prefix, leaves, treeType):
+    ''' Returns a random tree with the given number of leaves, in the format
+        read by newickFormatReader, and the list of its leaves.  Vertices are
+        named with the given prefix;  treeType is "host" or "parasite", and
+        the root edge of a parasite tree is named "pTop". '''
+    tree = {}
+    tips = []
+    counter = [0]
+    def name():
+        counter[0] += 1
+        return prefix + str(counter[0])
+    root = name()
+    stack = [("Top", root, leaves)]
+    while stack:
+        parent, vertex, n = stack.pop()
+        if parent == "Top" and treeType == "parasite":
+            edge = "pTop"
+        else:
+            edge = (parent, vertex)
+        if n == 1:
+            tips.append(vertex)
+            tree[edge] = (parent, vertex, None, None)
+        else:
+            left, right = name(), name()
+            k = random.randint(1, n - 1)
+            tree[edge] = (parent, vertex, (vertex, left), (vertex, right))
+            stack.append((vertex, left, k))
+            stack.append((vertex, right, n - k))
+    return tree, tips
@@ -21,6 +21,7 @@ from collections import *
 # xscape libraries
 from common import *
 from CostVector import *
+from ParetoFront import *
 
 # Base class
 from xscape import ReconcileAlgorithm
@@ -28,8 +29,10 @@ from xscape import ReconcileAlgorithm
 
 class ReconcileAlgorithmWithoutRecordedEvents(ReconcileAlgorithm.ReconcileAlgorithm):
 
-    def __init__(self, switchLo, switchHi, lossLo, lossHi):
-        ReconcileAlgorithm.ReconcileAlgorithm.__init__(self, switchLo, switchHi, lossLo, lossHi)
+    def __init__(self, switchLo, switchHi, lossLo, lossHi, hullPrune=False,
+                 tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT, switchLimit=None):
+        ReconcileAlgorithm.ReconcileAlgorithm.__init__(self, switchLo, switchHi, lossLo, lossHi,
+                                                       hullPrune, tolerance, counting, switchLimit)
 
     # This is the main function for this file.  It seeks to find the best
     # reconciliation for the parasite tree, rooted at every possible edge of the
@@ -38,13 +41,33 @@ class ReconcileAlgorithmWithoutRecordedEvents(ReconcileAlgorithm.ReconcileAlgori
         ''' Takes dictionary representations of the parasite tree, host tree
             and parasiteToHostMapping as input and returns a list of the Pareto optimal solutions. '''
             
-        self.ancestorsAndDescendants(hostTree) # Set the Ancestors and Descendants
+        self.compileHostTree(hostTree) # Number the host edges for switch landing sites
 
         solutions = reduce(lambda countAndCountVectorA, countAndCountVectorB: countAndCountVectorA + countAndCountVectorB, 
                         map(lambda hostEdge: self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, "pTop", hostEdge), 
                             hostTree.keys()))
 
-        return self.paretoFilter(solutions)
+        # Cospeciations are not counted by the DP; each internal vertex of the
+        # parasite tree that is not a duplication or a switch is one.
+        internalVertices = len([e for e in parasiteTree if not self.tipEdge(e, parasiteTree)])
+        self.solutionFront = self.paretoFilter(solutions).withCospeciations(internalVertices)
+        return self.solutionFront.toCostVectors(self.counting)
+
+    def placements(self, parasiteTree, hostTree, parasiteToHostMapping):
+        ''' A generator version of reconcile:  places the root of the parasite
+            tree on each host edge in turn, and after each placement yields a
+            pair (host edge, CVlist), where CVlist is the list of Pareto optimal
+            solutions among the placements so far.  The last CVlist is the
+            list that reconcile returns. '''
+
+        self.compileHostTree(hostTree) # Number the host edges for switch landing sites
+        internalVertices = len([e for e in parasiteTree if not self.tipEdge(e, parasiteTree)])
+        solutions = ParetoFront()
+        for hostEdge in hostTree.keys():
+            solutions = self.paretoFilter(solutions + \
+                self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, "pTop", hostEdge))
+            self.solutionFront = solutions.withCospeciations(internalVertices)
+            yield hostEdge, self.solutionFront.toCostVectors(self.counting)
 
     def optimalEdgeCost(self, parasiteTree, hostTree, parasiteToHostMapping, parasiteEdge, hostEdge):
         ''' The optimalEdgeCost table for the dynamic program. '''
@@ -62,18 +85,15 @@ class ReconcileAlgorithmWithoutRecordedEvents(ReconcileAlgorithm.ReconcileAlgori
             parasiteEdgeRightChild = self.rightChildEdge(parasiteEdge, parasiteTree)
         
             # Option 2:  Duplicate here
-            duplicate = CostVector(0, 1, 0, 0, 1) * \
-                        self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge), \
-                              self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge)) 
+            duplicate = self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge), \
+                              self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge)).offset(0, 1, 0, 0)
         
             # Option 3:  Switch here
-            switch1 = CostVector(0, 0, 1, 0, 1) * \
-                      self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge), \
-                            self.switches(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge))
+            switch1 = self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge), \
+                            self.switches(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge)).offset(0, 0, 1, 0)
 
-            switch2 = CostVector(0, 0, 1, 0, 1) * \
-                      self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge), \
-                            self.switches(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge))
+            switch2 = self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdge), \
+                            self.switches(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdge)).offset(0, 0, 1, 0)
 
             switch = switch1 + switch2
             
@@ -90,36 +110,32 @@ class ReconcileAlgorithmWithoutRecordedEvents(ReconcileAlgorithm.ReconcileAlgori
         if self.tipEdge(hostEdge, hostTree):
             if self.tipEdge(parasiteEdge, parasiteTree) and \
                 parasiteToHostMapping[self.endVertex(parasiteEdge, parasiteTree)] == self.endVertex(hostEdge, hostTree):
-                return [CostVector(0, 0, 0, 0, 1)]
+                return ParetoFront.single(0, 0, 0, 0, self.counting.one)
             else:
-                return [CostVector(INF, INF, INF, INF, 0)]
+                return ParetoFront()   # impossible placement
         else:
             hostEdgeLeftChild = self.leftChildEdge(hostEdge, hostTree)
             hostEdgeRightChild = self.rightChildEdge(hostEdge, hostTree)
 
-            # Cospeciation
+            # Cospeciation (not counted here; see reconcile)
             if self.tipEdge(parasiteEdge, parasiteTree):
-                cospeciation = [CostVector(INF, INF, INF, INF, 0)]
+                cospeciation = ParetoFront()
             else:
                 parasiteEdgeLeftChild = self.leftChildEdge(parasiteEdge, parasiteTree)
                 parasiteEdgeRightChild = self.rightChildEdge(parasiteEdge, parasiteTree)
 
-                cospeciation1 = CostVector(1, 0, 0, 0, 1) * \
-                  self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdgeLeftChild), \
+                cospeciation1 = self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdgeLeftChild), \
                         self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdgeRightChild))
 
-                cospeciation2 = CostVector(1, 0, 0, 0, 1) * \
-                  self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdgeRightChild), \
-                        self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdgeLeftChild)) \
+                cospeciation2 = self.merge(self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeLeftChild, hostEdgeRightChild), \
+                        self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdgeRightChild, hostEdgeLeftChild))
 
                 cospeciation = cospeciation1 + cospeciation2
                 
             # Loss
-            loss1 = CostVector(0, 0, 0, 1, 1) * \
-                    self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdge, hostEdgeLeftChild)
+            loss1 = self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdge, hostEdgeLeftChild).offset(0, 0, 0, 1)
 
-            loss2 = CostVector(0, 0, 0, 1, 1) * \
-                    self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdge, hostEdgeRightChild)
+            loss2 = self.optimalEdgeCost(parasiteTree, hostTree, parasiteToHostMapping, parasiteEdge, hostEdgeRightChild).offset(0, 0, 0, 1)
 
             loss = loss1 + loss2
             
@@ -127,11 +143,20 @@ class ReconcileAlgorithmWithoutRecordedEvents(ReconcileAlgorithm.ReconcileAlgori
             self.Amemo[(parasiteEdge, hostEdge)] = output
             return output
             
-    def merge(self, CVlist1, CVlist2):
-        ''' Given two lists of CostVectors, returns a new list of CostVectors, each
-            of which is the sum of a pair of vectors from the two given lists.'''
-        output = []
-        for v in CVlist1:
-            for w in CVlist2:
-                output.append(v+w)
-        return output
\ No newline at end of file
+    def merge(self, front1, front2):
+        ''' Given two ParetoFronts, returns a new ParetoFront holding the Pareto
+            optimal sums of a vector from each of the two given fronts.  Sums that
+            are dominated by another sum could never survive paretoFilter, so they
+            are pruned while the sums are generated (see ParetoFront.paretoMerge).'''
+        return front1.paretoMerge(front2, self.counting)
+
+
+def reconcile(parasiteTree, hostTree, phi, switchLo, switchHi, lossLo, lossHi,
+              hullPrune=False, tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT,
+              switchLimit=None):
+    ''' Returns the list of Pareto optimal solutions for the given trees and
+        tip associations. '''
+    reconciliationAlgorithm = ReconcileAlgorithmWithoutRecordedEvents(switchLo, switchHi, lossLo, lossHi,
+                                                                      hullPrune, tolerance, counting,
+                                                                      switchLimit)
+    return reconciliationAlgorithm.reconcile(parasiteTree, hostTree, phi)
@@ -0,0 +1,193 @@
+# reconcileAtCost.py
+# Tree reconciliation dynamic programming solver for untimed trees at a
+# single fixed cost.
+
+# Runs the recurrences of reconcileBottomUp.py, from the HMC Tech Report
+# "Faster Dynamic Programming Algorithms for the Cophylogeny Reconstruction
+# Problem", with one fixed loss cost and one fixed switch cost (relative to
+# the unit cost of duplication) rather than over a range of costs.  Each
+# table entry is then a single cell rather than a Pareto front, so this is
+# much faster than the full DP when only one point of the costscape is
+# needed, e.g. to check a region or to score many trees at a standard cost.
+
+# A cell is a tuple (cost, d, s, l, count) for the cheapest way of placing
+# the parasite subtree:  its cost, its numbers of duplications, switches,
+# and losses, and the number of reconciliations with that cost and those
+# events.  Where several event vectors have the same (optimal) cost, the
+# lexicographically smallest (d, s, l) is kept.  Lexicographic order is
+# preserved by adding vectors, so this choice is consistent across the DP
+# and the count of the chosen vector is exact.  Impossible placements are
+# represented by None.
+
+# xscape libraries
+from CostVector import *
+from CompiledTree import *
+
+TOLERANCE = 1e-9  # cost difference treated as a tie
+
+class ReconcileAlgorithmAtCost(object):
+
+    def __init__(self, loss, switch, tolerance=TOLERANCE, switchLimit=None):
+        self.loss = loss
+        self.switch = switch
+        self.tolerance = tolerance
+        self.switchLimit = switchLimit    # see switchLimit.py
+
+    def reconcile(self, parasiteTree, hostTree, phi):
+        ''' Takes representations of the parasite tree, host tree and phi as
+            input and returns a pair (cost, CostVector) for an optimal
+            reconciliation at the given costs.  The count of the CostVector
+            is the number of optimal reconciliations with its events.  The
+            trees may be given either as dictionaries or as CompiledTrees. '''
+
+        self.parasite = compileTree(parasiteTree, "pTop")
+        self.host = compileTree(hostTree)
+        self.tipHost = self.parasite.tipAssociations(phi, self.host)
+        self.switchSites = None
+        if self.switchLimit is not None:
+            self.switchSites = self.switchLimit.allLandingSites(self.host)
+
+        numParasiteEdges = len(self.parasite)
+        numHostEdges = len(self.host)
+        self.Amemo = [None] * numParasiteEdges
+        self.Cmemo = [None] * numParasiteEdges
+        self.Bestmemo = [None] * numParasiteEdges
+
+        for ep in range(numParasiteEdges):     # post-order
+            self.Amemo[ep] = [None] * numHostEdges
+            self.Cmemo[ep] = [None] * numHostEdges
+            for eh in range(numHostEdges):     # post-order
+                self.Amemo[ep][eh] = self.A(ep, eh)
+                self.Cmemo[ep][eh] = self.C(ep, eh)
+            if ep != self.parasite.root:
+                self.Bestmemo[ep] = self.BestRow(ep)
+
+        best = self.choose(self.Cmemo[self.parasite.root])
+        if best is None: return None
+        cost, d, s, l, count = best
+        internalVertices = numParasiteEdges - sum(self.parasite.tip)
+        return cost, CostVector(internalVertices - d - s, d, s, l, count)
+
+    def cell(self, d, s, l, count):
+        ''' Returns the cell for the given events and count. '''
+        return (d + s * self.switch + l * self.loss, d, s, l, count)
+
+    def merge(self, cell1, cell2, d=0, s=0, l=0):
+        ''' Returns the cell for the union of the events of two cells and the
+            given extra events, or None if either cell is impossible. '''
+        if cell1 is None or cell2 is None: return None
+        return self.cell(cell1[1] + cell2[1] + d, cell1[2] + cell2[2] + s,
+                         cell1[3] + cell2[3] + l, cell1[4] * cell2[4])
+
+    def offset(self, cell, d=0, s=0, l=0):
+        ''' Returns the cell with the given extra events, or None if the
+            cell is impossible. '''
+        if cell is None: return None
+        return self.cell(cell[1] + d, cell[2] + s, cell[3] + l, cell[4])
+
+    def choose(self, cells):
+        ''' Returns the best of the given cells:  the cheapest, with ties
+            broken lexicographically by (d, s, l) and the counts of equal
+            cells added together.  Returns None if all the cells are None. '''
+        output = None
+        for cell in cells:
+            if cell is None: continue
+            if output is None or cell[0] < output[0] - self.tolerance:
+                output = cell
+            elif cell[0] <= output[0] + self.tolerance:
+                if cell[1:4] < output[1:4]:
+                    output = cell
+                elif cell[1:4] == output[1:4]:
+                    output = output[:4] + (output[4] + cell[4],)
+        return output
+
+    def A(self, ep, eh):
+        ''' Computes the A table entry for ep on eh.  The C table entries for
+            the children of ep and of eh must already be filled in. '''
+
+        parasite = self.parasite
+        host = self.host
+        if host.tip[eh]:
+            if self.tipHost[ep] == eh:
+                return self.cell(0, 0, 0, 1)
+            else:
+                return None   # impossible placement
+
+        ehLeftChild = host.left[eh]
+        ehRightChild = host.right[eh]
+
+        # Cospeciation (not counted here; see reconcile)
+        if parasite.tip[ep]:
+            cospeciation1 = cospeciation2 = None
+        else:
+            CLeft = self.Cmemo[parasite.left[ep]]
+            CRight = self.Cmemo[parasite.right[ep]]
+            cospeciation1 = self.merge(CLeft[ehLeftChild], CRight[ehRightChild])
+            cospeciation2 = self.merge(CLeft[ehRightChild], CRight[ehLeftChild])
+
+        # Loss
+        loss1 = self.offset(self.Cmemo[ep][ehLeftChild], l=1)
+        loss2 = self.offset(self.Cmemo[ep][ehRightChild], l=1)
+
+        return self.choose([cospeciation1, cospeciation2, loss1, loss2])
+
+    def C(self, ep, eh):
+        ''' Computes the C table entry for ep on eh.  The A table entry for
+            ep on eh and the C and Best table entries for the children of ep
+            must already be filled in. '''
+
+        parasite = self.parasite
+
+        # Option 1:  Pass through
+        passThrough = self.Amemo[ep][eh]
+
+        if parasite.tip[ep]:  # The options below don't apply to tips
+            return passThrough
+
+        epLeftChild = parasite.left[ep]
+        epRightChild = parasite.right[ep]
+
+        # Option 2:  Duplicate here
+        duplicate = self.merge(self.Cmemo[epLeftChild][eh], self.Cmemo[epRightChild][eh], d=1)
+
+        # Option 3:  Switch here
+        switch1 = self.merge(self.Cmemo[epLeftChild][eh], self.Bestmemo[epRightChild][eh], s=1)
+        switch2 = self.merge(self.Cmemo[epRightChild][eh], self.Bestmemo[epLeftChild][eh], s=1)
+
+        return self.choose([passThrough, duplicate, switch1, switch2])
+
+    def BestRow(self, ep):
+        ''' Computes the Best table row for ep from subtree and outside
+            summaries of its C table row, as in
+            ReconcileAlgorithmBottomUp.BestRow, or from the landing sites
+            allowed by the switch limit. '''
+        host = self.host
+        Crow = self.Cmemo[ep]
+        numHostEdges = len(host)
+        if self.switchSites is not None:
+            return [self.choose([Crow[x] for x in sites]) for sites in self.switchSites]
+
+        subtree = [None] * numHostEdges
+        for eh in range(numHostEdges):                  # children before parents
+            if host.tip[eh]:
+                subtree[eh] = Crow[eh]
+            else:
+                subtree[eh] = self.choose([Crow[eh], subtree[host.left[eh]],
+                                           subtree[host.right[eh]]])
+
+        outside = [None] * numHostEdges
+        output = [None] * numHostEdges
+        for eh in reversed(range(numHostEdges)):        # parents before children
+            if host.parent[eh] != NONE:
+                outside[eh] = self.choose([outside[host.parent[eh]],
+                                           subtree[host.sibling(eh)]])
+            output[eh] = self.choose([outside[eh], Crow[eh]])
+        return output
+
+
+def reconcileAtCost(parasiteTree, hostTree, phi, loss, switch, switchLimit=None):
+    ''' Returns a pair (cost, CostVector) for an optimal reconciliation of
+        the given trees and tip associations at the given loss and switch
+        costs, or None if there is none. '''
+    reconciliationAlgorithm = ReconcileAlgorithmAtCost(loss, switch, switchLimit=switchLimit)
+    return reconciliationAlgorithm.reconcile(parasiteTree, hostTree, phi)
@@ -0,0 +1,82 @@
+# reconcileBatch.py
+# Batch reconciliation of many parasite trees against one host tree
+
+# Many parasite (e.g. gene family) trees are often reconciled with the same
+# host tree.  The host tree is compiled only once, as are the landing sites
+# that a switch limit allows on it (see switchLimit.py), and the families are
+# farmed out to a pool of worker processes, in chunks of several families
+# at a time.  The pool is started after the host tree is compiled, so (where
+# processes are forked) the workers inherit it rather than having it pickled
+# for every family.  Results are returned as each family is done, so they
+# can be written out as they come.
+
+# python libraries
+import multiprocessing
+import time
+import traceback
+
+# xscape libraries
+from CompiledTree import *
+from counting import *
+from xscape import ReconcileAlgorithm
+from xscape import reconcileBottomUp
+
+# The compiled host tree, its allowed landing sites (or None), and the
+# reconciliation options, inherited by the worker processes from the parent
+# process
+_host = None
+_hostSwitchSites = None
+_options = None
+
+
+def reconcileMany(hostTree, families, switchLo, switchHi, lossLo, lossHi,
+                  hullPrune=False, tolerance=ReconcileAlgorithm.HULL_TOLERANCE,
+                  counting=EXACT, processes=None, chunksize=1, switchLimit=None):
+    ''' Takes a host tree and an iterable of (parasiteTree, phi) pairs and
+        reconciles each parasite tree with the host tree.  Yields a tuple
+        (index, CVlist, seconds, error) for each family as soon as it is
+        done, which need not be in the order of the families:  index is the
+        position of the family, CVlist its list of Pareto optimal solutions,
+        and seconds the time taken to reconcile it.  If reconciling the
+        family fails, CVlist is None and error is the traceback; otherwise
+        error is None.  Uses the given number of processes (one per CPU by
+        default), and hands them chunksize families at a time. '''
+
+    global _host, _hostSwitchSites, _options
+    _host = compileTree(hostTree)
+    if switchLimit is not None:
+        _hostSwitchSites = switchLimit.allLandingSites(_host)
+    _options = (switchLo, switchHi, lossLo, lossHi, hullPrune, tolerance, counting, switchLimit)
+    try:
+        if processes == 1:
+            for indexAndFamily in enumerate(families):
+                yield reconcileFamily(indexAndFamily)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                for result in pool.imap_unordered(reconcileFamily, enumerate(families), chunksize):
+                    yield result
+            finally:
+                pool.terminate()
+                pool.join()
+    finally:
+        _host = _hostSwitchSites = _options = None
+
+
+def reconcileFamily(indexAndFamily):
+    ''' Reconciles one family with the shared host tree and returns a tuple
+        (index, CVlist, seconds, error) as described in reconcileMany. '''
+    index, (parasiteTree, phi) = indexAndFamily
+    switchLo, switchHi, lossLo, lossHi, hullPrune, tolerance, counting, switchLimit = _options
+    startTime = time.time()
+    try:
+        # The tables are not needed afterwards, so rows are released early
+        reconciliationAlgorithm = reconcileBottomUp.ReconcileAlgorithmBottomUp(switchLo, switchHi, lossLo, lossHi,
+                                                                               hullPrune, tolerance, counting,
+                                                                               lowMemory=True,
+                                                                               switchLimit=switchLimit,
+                                                                               hostSwitchSites=_hostSwitchSites)
+        CVlist = reconciliationAlgorithm.reconcile(parasiteTree, _host, phi)
+        return index, CVlist, time.time() - startTime, None
+    except Exception:
+        return index, None, time.time() - startTime, traceback.format_exc()
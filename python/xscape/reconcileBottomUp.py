@@ -0,0 +1,338 @@
+# reconcileBottomUp.py
+# Bottom-up Pareto tree reconciliation dynamic programming solver for
+# untimed trees.
+
+# Fills the same A, C, and Best tables as reconcile.py, using the same
+# recurrences from the HMC Tech Report "Faster Dynamic Programming Algorithms
+# for the Cophylogeny Reconstruction Problem", but in an explicit order rather
+# than by memoized recursion:  parasite edges are visited in post-order and,
+# for each parasite edge, host edges are visited in post-order.  Every table
+# entry that a cell depends on has therefore been computed before the cell
+# itself, so no recursion is needed and deep (e.g. caterpillar) trees do not
+# exhaust the Python recursion limit.
+
+# The trees are passed in using the same dictionary representation as
+# reconcile.py but are compiled to CompiledTrees before the DP runs, so edges
+# are integers numbered in post-order and the A, C, and Best tables are dense
+# lists of rows:  self.Cmemo[ep][eh] is the C table entry for parasite edge
+# number ep on host edge number eh.
+
+# The rows for a parasite edge are only read while filling in the rows of its
+# parent edge.  In low-memory mode they are released as soon as that is done
+# (and the A table row as soon as the C table row is done), so only the rows
+# of the edges whose parents are still to come are alive at any time.  In
+# post-order these are the completed siblings of the edges on one path from
+# the root, so the memory used grows with the depth of the parasite tree
+# rather than its size.  Only the C table row for the root is kept.
+
+# The finished C and Best table rows can also be saved to a checkpoint file
+# as they are computed (see checkpoint.py), so that a long run that is
+# killed can be resumed from the last row saved.
+
+# python libraries
+from collections import *
+
+# xscape libraries
+from common import *
+from CostVector import *
+from ParetoFront import *
+from CompiledTree import *
+from checkpoint import *
+
+# Base class
+from xscape import ReconcileAlgorithm
+
+
+class ReconcileAlgorithmBottomUp(ReconcileAlgorithm.ReconcileAlgorithm):
+
+    def __init__(self, switchLo, switchHi, lossLo, lossHi, hullPrune=False,
+                 tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT, lowMemory=False,
+                 switchLimit=None, hostSwitchSites=None):
+        ReconcileAlgorithm.ReconcileAlgorithm.__init__(self, switchLo, switchHi, lossLo, lossHi,
+                                                       hullPrune, tolerance, counting, switchLimit)
+        self.lowMemory = lowMemory
+
+        # The landing sites allowed by the switch limit on the host tree, if
+        # they have already been found (see reconcileBatch.py, which shares
+        # them between the parasite trees reconciled with one host tree)
+        self.hostSwitchSites = hostSwitchSites
+
+    def reconcile(self, parasiteTree, hostTree, phi, checkpoint=None, resume=False):
+        ''' Takes representations of the parasite tree, host tree and phi as
+            input and returns a list of the Pareto optimal solutions.  The
+            trees may be given either as dictionaries or as CompiledTrees.
+            If a Checkpoint is given, the finished rows are saved to it, and
+            if resume is True, the rows already saved to it are reloaded
+            rather than recomputed. '''
+
+        self.prepare(parasiteTree, hostTree, phi)
+        start = 0
+        if checkpoint is not None:
+            # The saved rows are read one at a time, so that with lowMemory
+            # those no longer needed are released as the file is read
+            for ep, Crow, BestRow in checkpoint.open(self.checkpointHeader(), resume):
+                self.Cmemo[ep] = Crow
+                self.Bestmemo[ep] = BestRow
+                if self.lowMemory:
+                    self.releaseRows(ep)
+                start = ep + 1
+        try:
+            for ep in range(start, len(self.parasite)):   # post-order
+                self.fillRow(ep)
+                if checkpoint is not None:
+                    checkpoint.save((ep, self.Cmemo[ep], self.Bestmemo[ep]))
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        return self.solutions()
+
+    def checkpointHeader(self):
+        ''' Returns the inputs and options that the rows depend on, which
+            identify the run in a checkpoint file. '''
+        return (self.parasite.names, self.host.names, list(self.tipHost),
+                self.switchLo, self.switchHi, self.lossLo, self.lossHi,
+                self.hullPrune, self.tolerance, self.counting.name,
+                None if self.switchLimit is None else self.switchLimit.key())
+
+    def prepare(self, parasiteTree, hostTree, phi):
+        ''' Compiles the trees and sets up empty A, C, and Best tables. '''
+
+        self.parasite = compileTree(parasiteTree, "pTop")
+        self.host = compileTree(hostTree)
+        self.tipHost = self.parasite.tipAssociations(phi, self.host)
+        if self.hostSwitchSites is None:
+            self.switchSites = self.allowedLandingSites(self.host)
+        elif len(self.hostSwitchSites) != len(self.host):
+            raise ValueError("the given landing sites are not those of the host tree")
+        else:
+            self.switchSites = self.hostSwitchSites
+
+        numParasiteEdges = len(self.parasite)
+        self.Amemo = [None] * numParasiteEdges
+        self.Cmemo = [None] * numParasiteEdges
+        self.Bestmemo = [None] * numParasiteEdges
+        self.tablesZoomed = True
+
+    def placements(self, parasiteTree, hostTree, phi):
+        ''' A generator version of reconcile:  fills in the rows below the
+            root of the parasite tree, then places the root on each host edge
+            in turn, and after each placement yields a pair (host edge,
+            CVlist), where CVlist is the list of Pareto optimal solutions
+            among the placements so far.  The last CVlist is the list that
+            reconcile returns. '''
+
+        self.prepare(parasiteTree, hostTree, phi)
+        root = self.parasite.root
+        for ep in range(root):          # post-order
+            self.fillRow(ep)
+        internalVertices = len(self.parasite) - sum(self.parasite.tip)
+        solutions = ParetoFront()
+        for eh in self.fillCells(root):
+            solutions = self.paretoFilter(solutions + self.Cmemo[root][eh])
+            self.solutionFront = solutions.withCospeciations(internalVertices)
+            yield self.host.names[eh], self.solutionFront.toCostVectors(self.counting)
+
+    def fillRow(self, ep):
+        ''' Fills in the A, C, and Best table rows for parasite edge ep.  The
+            C and Best table rows for the children of ep must already be
+            filled in. '''
+        for eh in self.fillCells(ep):
+            pass
+
+    def fillCells(self, ep):
+        ''' Fills in the rows for parasite edge ep as fillRow does, yielding
+            each host edge as soon as the C table entry on it is done. '''
+
+        numHostEdges = len(self.host)
+        self.Amemo[ep] = [None] * numHostEdges
+        self.Cmemo[ep] = [None] * numHostEdges
+        for eh in range(numHostEdges):     # post-order
+            self.Amemo[ep][eh] = self.A(ep, eh)
+            self.Cmemo[ep][eh] = self.C(ep, eh)
+            yield eh
+        if ep != self.parasite.root:
+            self.Bestmemo[ep] = self.BestRow(ep)
+        if self.lowMemory:
+            self.releaseRows(ep)
+
+    def releaseRows(self, ep):
+        ''' Releases the rows that are no longer needed once the rows for
+            parasite edge ep are complete:  its A table row and the C and
+            Best table rows of its children. '''
+        parasite = self.parasite
+        self.Amemo[ep] = None
+        if not parasite.tip[ep]:
+            for child in (parasite.left[ep], parasite.right[ep]):
+                self.Cmemo[child] = None
+                self.Bestmemo[child] = None
+
+    def updateTips(self, phiChanges):
+        ''' Takes a dictionary mapping some parasite tips to new host tips,
+            updates the tip associations of the last reconciliation, and
+            returns the new list of Pareto optimal solutions.  Only the rows
+            of the changed parasite tip edges and their ancestors depend on
+            the change, so only those are recomputed, in post-order. '''
+
+        if self.lowMemory:
+            raise ValueError("updateTips needs the DP tables, which are not kept in low-memory mode")
+        self.zoomTables()
+        parasite = self.parasite
+        stale = set()
+        for parasiteTip, hostTip in phiChanges.iteritems():
+            ep = parasite.vertexIndex[parasiteTip]
+            self.tipHost[ep] = self.host.vertexIndex[hostTip]
+            while ep != NONE and ep not in stale:
+                stale.add(ep)
+                ep = parasite.parent[ep]
+        for ep in sorted(stale):       # post-order
+            self.fillRow(ep)
+        return self.solutions()
+
+    def solutions(self):
+        ''' Returns the list of Pareto optimal solutions, once the C table
+            row for the root of the parasite tree has been filled in. '''
+
+        # Cospeciations are not counted by the DP; each internal vertex of the
+        # parasite tree that is not a duplication or a switch is one.
+        solutions = ParetoFront.concat(self.Cmemo[self.parasite.root])
+        internalVertices = len(self.parasite) - sum(self.parasite.tip)
+        self.solutionFront = self.paretoFilter(solutions).withCospeciations(internalVertices)
+        return self.solutionFront.toCostVectors(self.counting)
+
+    def zoom(self, switchLo, switchHi, lossLo, lossHi):
+        ''' Narrows the range of switch and loss costs, as in the base class.
+            The tables are only filtered for the new range when updateTips
+            next needs them (see zoomTables), so tablesZoomed is False until
+            then. '''
+        CVlist = ReconcileAlgorithm.ReconcileAlgorithm.zoom(self, switchLo, switchHi, lossLo, lossHi)
+        self.tablesZoomed = False
+        return CVlist
+
+    def zoomTables(self):
+        ''' Filters the A and C table rows that are still alive for the
+            current cost range, and rebuilds the Best table rows from the
+            filtered C table rows. '''
+        if self.tablesZoomed: return
+        self.tablesZoomed = True
+        for table in (self.Amemo, self.Cmemo):
+            for ep, row in enumerate(table):
+                if row is not None:
+                    table[ep] = [self.paretoFilter(front) for front in row]
+        for ep, row in enumerate(self.Bestmemo):
+            if row is not None:
+                self.Bestmemo[ep] = self.BestRow(ep)
+
+    def A(self, ep, eh):
+        ''' Computes the A table entry for ep on eh.  The C table entries for
+            the children of ep and of eh must already be filled in. '''
+
+        parasite = self.parasite
+        host = self.host
+        if host.tip[eh]:
+            if self.tipHost[ep] == eh:
+                return ParetoFront.single(0, 0, 0, 0, self.counting.one)
+            else:
+                return ParetoFront()   # impossible placement
+
+        ehLeftChild = host.left[eh]
+        ehRightChild = host.right[eh]
+
+        # Cospeciation (not counted here; see reconcile)
+        if parasite.tip[ep]:
+            cospeciation = ParetoFront()
+        else:
+            CLeft = self.Cmemo[parasite.left[ep]]
+            CRight = self.Cmemo[parasite.right[ep]]
+
+            cospeciation1 = self.merge(CLeft[ehLeftChild], CRight[ehRightChild])
+            cospeciation2 = self.merge(CLeft[ehRightChild], CRight[ehLeftChild])
+            cospeciation = cospeciation1 + cospeciation2
+
+        # Loss
+        loss1 = self.Cmemo[ep][ehLeftChild].offset(0, 0, 0, 1)
+        loss2 = self.Cmemo[ep][ehRightChild].offset(0, 0, 0, 1)
+        loss = loss1 + loss2
+
+        return self.paretoFilter(cospeciation + loss)
+
+    def C(self, ep, eh):
+        ''' Computes the C table entry for ep on eh.  The A table entry for
+            ep on eh and the C and Best table entries for the children of ep
+            must already be filled in. '''
+
+        parasite = self.parasite
+
+        # Option 1:  Pass through
+        passThrough = self.Amemo[ep][eh]
+
+        if parasite.tip[ep]:  # The options below don't apply to tips
+            return passThrough
+
+        epLeftChild = parasite.left[ep]
+        epRightChild = parasite.right[ep]
+
+        # Option 2:  Duplicate here
+        duplicate = self.merge(self.Cmemo[epLeftChild][eh], self.Cmemo[epRightChild][eh]).offset(0, 1, 0, 0)
+
+        # Option 3:  Switch here
+        switch1 = self.merge(self.Cmemo[epLeftChild][eh], self.Bestmemo[epRightChild][eh]).offset(0, 0, 1, 0)
+        switch2 = self.merge(self.Cmemo[epRightChild][eh], self.Bestmemo[epLeftChild][eh]).offset(0, 0, 1, 0)
+        switch = switch1 + switch2
+
+        return self.paretoFilter(passThrough + duplicate + switch)
+
+    def merge(self, front1, front2):
+        ''' Returns the ParetoFront of the sums of the pairs of vectors from
+            the two given ParetoFronts (see ParetoFront.paretoMerge). '''
+        return front1.paretoMerge(front2, self.counting)
+
+    def BestRow(self, ep):
+        ''' Computes the Best table row for ep:  for each host edge eh, all
+            the vectors in which ep switches away from eh.  The whole C table
+            row for ep must already be filled in.
+
+            The landing sites for a switch from eh are eh itself and the edges
+            that are neither its ancestors nor its descendants.  Rather than
+            scanning them for every eh, the row is built from two summaries
+            described in the technical report:  subtree[eh], the Pareto union
+            of the C entries on eh and its descendants, computed bottom-up,
+            and outside[eh], the Pareto union of the C entries on the landing
+            sites other than eh, computed top-down from the outside of the
+            parent of eh and the subtree of its sibling.  With a switch limit,
+            each entry is instead the union of the C entries on the landing
+            sites that the limit allows. '''
+        host = self.host
+        Crow = self.Cmemo[ep]
+        numHostEdges = len(host)
+        if self.switchSites is not None:
+            return [self.paretoUnion([Crow[x] for x in sites]) for sites in self.switchSites]
+
+        subtree = [None] * numHostEdges
+        for eh in range(numHostEdges):                  # children before parents
+            if host.tip[eh]:
+                subtree[eh] = Crow[eh]
+            else:
+                subtree[eh] = self.paretoUnion([Crow[eh], subtree[host.left[eh]],
+                                                subtree[host.right[eh]]])
+
+        outside = [None] * numHostEdges
+        output = [None] * numHostEdges
+        for eh in reversed(range(numHostEdges)):        # parents before children
+            if host.parent[eh] == NONE:
+                outside[eh] = ParetoFront()
+            else:
+                outside[eh] = self.paretoUnion([outside[host.parent[eh]],
+                                                subtree[host.sibling(eh)]])
+            output[eh] = self.paretoUnion([outside[eh], Crow[eh]])
+        return output
+
+
+def reconcile(parasiteTree, hostTree, phi, switchLo, switchHi, lossLo, lossHi,
+              hullPrune=False, tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT,
+              lowMemory=False, switchLimit=None):
+    ''' Returns the list of Pareto optimal solutions for the given trees and
+        tip associations. '''
+    reconciliationAlgorithm = ReconcileAlgorithmBottomUp(switchLo, switchHi, lossLo, lossHi,
+                                                         hullPrune, tolerance, counting, lowMemory,
+                                                         switchLimit)
+    return reconciliationAlgorithm.reconcile(parasiteTree, hostTree, phi)
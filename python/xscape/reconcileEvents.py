@@ -10,11 +10,14 @@
 
 # python libraries
 from collections import *
+from bisect import bisect_right
 import copy
 
 # xscape libraries
 from common import *
 from CostVector import *
+from ParetoFront import *
+from eventDAG import *
 
 # Base class
 from xscape import ReconcileAlgorithm
@@ -23,21 +26,40 @@ from xscape import ReconcileAlgorithm
 class Config:     # to get around immutable globals
     pass
 CONFIG = Config()
-CVseen = defaultdict(bool) # Initially all values are False by default
-CVcommonEvents = defaultdict(set)
+
+# The numbers of (c, d, s, l) events added by each event type
+EVENTVECTORS = {"cospeciation": (1, 0, 0, 0),
+                "duplication": (0, 1, 0, 0),
+                "switch": (0, 0, 1, 0),
+                "loss": (0, 0, 0, 1)}
 
 class ReconcileAlgorithmWithRecordedEvents(ReconcileAlgorithm.ReconcileAlgorithm):
 
-    def __init__(self, switchLo, switchHi, lossLo, lossHi):
-        ReconcileAlgorithm.ReconcileAlgorithm.__init__(self, switchLo, switchHi, lossLo, lossHi)
+    def __init__(self, switchLo, switchHi, lossLo, lossHi, switchLimit=None):
+        ReconcileAlgorithm.ReconcileAlgorithm.__init__(self, switchLo, switchHi, lossLo, lossHi,
+                                                       switchLimit=switchLimit)
 
-        # The CVevents global dictionary has keys that are tuples of the form
+        # The CVevents dictionary has keys that are tuples of the form
         # (ep, eh, eventType c, d, s, l) and values that are all the events in 
         # that solution of the form (ep', eh', eventTypeString) associated with 
-        # ep on eh with cost vector <c, d, s, l>
-        self.CVevents = defaultdict(set)
-        self.CVallEvents = defaultdict(set)
+        # ep on eh with cost vector <c, d, s, l>.  The CVallEvents dictionary
+        # has keys of the form (ep, eh, c, d, s, l) and values that are all the
+        # events of the solutions for ep on eh with that cost vector.  Both are
+        # found on demand from the shared event DAG (see eventDAG.py), which
+        # also gives them as bitmasks of event numbers (eventMask and
+        # solutionMask) for combining without building the sets.
+        self.eventDAG = EventDAG()
+        self.CVevents = EventSets(self.eventDAG, self.eventDAG.eventMask)
+        self.CVallEvents = EventSets(self.eventDAG, self.eventDAG.solutionMask)
+
+        # CandidateCVlist may be set to the optimal CostVectors found by an
+        # engine that does not record events (see eventscape).  A partial
+        # solution whose vector is dominated by one of them can't be part of
+        # an optimal solution, since costs only grow as it is extended, so its
+        # events are not recorded.  The candidates are indexed for dominance
+        # queries (see DominanceIndex) when reconcile starts.
         self.CandidateCVlist = list()
+        self.candidateIndex = DominanceIndex([])
 
     # This is the main function for this file.  It seeks to find the best
     # reconciliation for the parasite tree, rooted at every possible edge of the
@@ -46,12 +68,14 @@ class ReconcileAlgorithmWithRecordedEvents(ReconcileAlgorithm.ReconcileAlgorithm
         ''' Takes dictionary representations of the parasite tree, host tree
             and phi as input and returns a list of the Pareto optimal solutions. '''
         
-        self.ancestorsAndDescendants(hostTree) # Set the Ancestors and Descendants
+        self.compileHostTree(hostTree) # Number the host edges for switch landing sites
+        self.candidateIndex = DominanceIndex([cv.toTupleCDSL()[1:] for cv in self.CandidateCVlist])
         
         solutions = []
         for eh in hostTree:
-            solutions.extend(self.optimalEdgeCost(parasiteTree, hostTree, phi, "pTop", eh))
-        return(self.paretoFilter(solutions))
+            solutions.append(self.optimalEdgeCost(parasiteTree, hostTree, phi, "pTop", eh))
+        self.solutionFront = self.paretoFilter(ParetoFront.concat(solutions))
+        return self.solutionFront.toCostVectors(self.counting)
 
     # The A and C functions implement the A and C DPs in the HMC Tech Report
     # "Faster Dynamic Programming Algorithms for the Cophylogeny Reconstruction
@@ -65,16 +89,16 @@ class ReconcileAlgorithmWithRecordedEvents(ReconcileAlgorithm.ReconcileAlgorithm
         if self.tipEdge(eh, hostTree):
             if self.tipEdge(ep, parasiteTree) and \
                phi[self.endVertex(ep, parasiteTree)] == self.endVertex(eh, hostTree):
-                return [CostVector(0, 0, 0, 0, 1)]
+                return ParetoFront.single(0, 0, 0, 0, 1)
             else:
-                return [CostVector(INF, INF, INF, INF, 0)]
+                return ParetoFront()   # impossible placement
         else:
             ehLeftChild = self.leftChildEdge(eh, hostTree)
             ehRightChild = self.rightChildEdge(eh, hostTree)
 
             # Cospeciation
             if self.tipEdge(ep, parasiteTree):
-                cospeciation = [CostVector(INF, INF, INF, INF, 0)]
+                cospeciation = ParetoFront()
             else:
                 epLeftChild = self.leftChildEdge(ep, parasiteTree)
                 epRightChild = self.rightChildEdge(ep, parasiteTree)
@@ -131,116 +155,112 @@ class ReconcileAlgorithmWithRecordedEvents(ReconcileAlgorithm.ReconcileAlgorithm
         
             switch = []
             leftCVlist = self.optimalEdgeCost(parasiteTree, hostTree, phi, epLeftChild, eh)
-            rightPairs = self.switches(parasiteTree, hostTree, phi, epRightChild, eh)
+            rightPairs = self.allSwitches(parasiteTree, hostTree, phi, epRightChild, eh)
             for (switchEdge, rightCVlist) in rightPairs:
-                switch.extend(self.merge(leftCVlist, rightCVlist, \
+                switch.append(self.merge(leftCVlist, rightCVlist, \
                                     ep, eh, epLeftChild, eh, epRightChild, \
                                     switchEdge, "switch"))
                 
             leftCVlist = self.optimalEdgeCost(parasiteTree, hostTree, phi, epRightChild, eh)
-            rightPairs = self.switches(parasiteTree, hostTree, phi, epLeftChild, eh)
+            rightPairs = self.allSwitches(parasiteTree, hostTree, phi, epLeftChild, eh)
             for (switchEdge, rightCVlist) in rightPairs:
-                switch.extend(self.merge(leftCVlist, rightCVlist, \
+                switch.append(self.merge(leftCVlist, rightCVlist, \
                                     ep, eh, epRightChild, eh, epLeftChild, \
                                     switchEdge, "switch"))
                    
-        output = self.paretoFilter(passThrough + duplicate + switch)
+        output = self.paretoFilter(ParetoFront.concat([passThrough, duplicate] + switch))
         self.Cmemo[(ep, eh)] = output
 
         return output
 
     def merge(self, CVlist1, CVlist2, ep, eh, epChild1, ehChild1, epChild2, \
               ehChild2, eventType):
-        ''' Given two lists of CostVectors, returns a new list of CostVectors, each
-            of which is the sum of a pair of vectors from the two given lists.'''
+        ''' Given two ParetoFronts, returns a new ParetoFront, each vector
+            of which is the sum of a pair of vectors from the two given fronts
+            and the given event, and records the events of each new solution.'''
 
-        intersection = CONFIG.intersection
-        if intersection:
-            global CVseen
-            global CVcommonEvents
-            
-        output = []
-        for v in CVlist1:
-            for w in CVlist2:
-                if eventType == "cospeciation":
-                    newCV = CostVector(1, 0, 0, 0, 1) + v + w
-                elif eventType == "duplication":
-                    newCV = CostVector(0, 1, 0, 0, 1) + v + w
-                else:   # eventType == "switch":
-                    newCV = CostVector(0, 0, 1, 0, 1) + v + w
-                keepnewCV = True
-                for cv in self.CandidateCVlist:
-                    if cv < newCV: 
-                        keepnewCV = False
-                        break
+        merged = CVlist1.merge(CVlist2).offset(*EVENTVECTORS[eventType])
+        if eventType == "switch": eventType = "switch to "+str(ehChild2)
+        size2 = len(CVlist2)
+        keep = []
+        for k in range(len(merged)):
+            newCV = merged.vector(k)
+            if self.dominatedByCandidate(newCV): continue
         
-                if keepnewCV:
-                    output.append(newCV)
-                    vsoln = (epChild1, ehChild1) + v.toTupleCDSL()
-                    wsoln = (epChild2, ehChild2) + w.toTupleCDSL()
-                    if eventType == "switch": eventType = "switch to "+str(ehChild2)
-                    nswe = (ep, eh, eventType) + newCV.toTupleCDSL()
-                    ns = (ep, eh) + newCV.toTupleCDSL()
-                    self.CVevents[nswe].add(nswe)
-                    self.CVevents[nswe] = self.CVevents[nswe].\
-                                     union(self.CVallEvents[vsoln]).\
-                                     union(self.CVallEvents[wsoln])
-                    self.CVallEvents[ns] = self.CVallEvents[ns].union(self.CVevents[nswe])
-
-                    if intersection:
-                        key = newCV.toTupleCDSL()
-                        if CVseen[key]:
-                            CVcommonEvents[key] = CVcommonEvents[key].\
-                                                  intersection(self.CVevents[nswe])
-                        else:
-                            CVcommonEvents[key] = self.CVevents[nswe]
-                            CVseen[key] = True
-        return output
+            keep.append(k)
+            vsoln = (epChild1, ehChild1) + CVlist1.vector(k // size2)
+            wsoln = (epChild2, ehChild2) + CVlist2.vector(k % size2)
+            self.eventDAG.add((ep, eh, eventType) + newCV, (ep, eh) + newCV, [vsoln, wsoln])
+        return merged.select(keep)
 
     def lossmerge(self, ep, eh, ehChild, CVlist):
 
-        intersection = CONFIG.intersection
-        if intersection:
-            global CVseen
-            global CVcommonEvents
-        
-        output = []
-        for v in CVlist:
-            newCV = CostVector(0, 0, 0, 1, 1) + v
-            keepnewCV = True
-            for cv in self.CandidateCVlist:
-                if cv < newCV: 
-                    keepnewCV = False
-                    break
+        lost = CVlist.offset(*EVENTVECTORS["loss"])
+        keep = []
+        for k in range(len(lost)):
+            newCV = lost.vector(k)
+            if self.dominatedByCandidate(newCV): continue
         
-            if keepnewCV:
-                output.append(newCV)
-                vsoln = (ep, ehChild) + v.toTupleCDSL()
-                nswe = (ep, eh, "loss "+str(ehChild)) + newCV.toTupleCDSL()
-                ns = (ep, eh) + newCV.toTupleCDSL()
-                self.CVevents[nswe].add(nswe)
-                self.CVevents[nswe] = self.CVevents[nswe].union(self.CVallEvents[vsoln])
-                self.CVallEvents[ns] = self.CVallEvents[ns].union(self.CVevents[nswe])
-
-                if intersection:
-                    key = newCV.toTupleCDSL()
-                    if CVseen[key]:
-                        self.CVcommonEvents[key] = CVcommonEvents[key].\
-                                                  intersection(self.CVevents[nswe])
-                    else:
-                        self.CVcommonEvents[key] = self.CVevents[nswe]
-                        self.CVseen[key] = True
-        return output
+            keep.append(k)
+            vsoln = (ep, ehChild) + CVlist.vector(k)
+            self.eventDAG.add((ep, eh, "loss "+str(ehChild)) + newCV, (ep, eh) + newCV, [vsoln])
+        return lost.select(keep)
+
+    def dominatedByCandidate(self, vector):
+        ''' Returns True if the given (c, d, s, l) vector is dominated by
+            one of the CostVectors in self.CandidateCVlist. '''
+        return self.candidateIndex.dominates(vector[1:])
 
     def allSwitches(self, parasiteTree, hostTree, phi, ep, eh):
-        ''' Returns the list of all CostVectors in which the given parasite edge ep
-            switches to all possible host edges. '''
+        ''' Returns the list of (host edge, ParetoFront) pairs for all the host
+            edges to which the given parasite edge ep may switch from eh. '''
         if (ep, eh) in self.Bestmemo: return self.Bestmemo[(ep, eh)]
         output = []
-        for switchEdge in hostTree:     # for every possible host edge
-            if switchEdge not in self.Ancestors[eh] and \
-               switchEdge not in self.Descendants[eh]:
-                output.append((switchEdge, \
-                                   self.optimalEdgeCost(parasiteTree, hostTree, phi, ep, switchEdge)))
+        for switchEdge in self.landingSites(eh):
+            output.append((switchEdge, \
+                           self.optimalEdgeCost(parasiteTree, hostTree, phi, ep, switchEdge)))
         self.Bestmemo[(ep, eh)] = output
-        return output
\ No newline at end of file
+        return output
+
+
+class DominanceIndex(object):
+    ''' An index of a list of (d, s, l) vectors that answers whether a vector
+        is dominated by one of them (no larger in every component and not
+        equal) in logarithmic time.  The minimal vectors are sorted by d, and
+        for each prefix of them the (s, l) staircase is kept:  the distinct
+        values of s in increasing order with the smallest l of the vectors
+        with at most that s. '''
+
+    def __init__(self, vectors):
+        vectors = sorted(set(vectors))
+        minimal = [v for v in vectors
+                   if not any(u[0] <= v[0] and u[1] <= v[1] and u[2] <= v[2]
+                              for u in vectors if u != v)]
+        self.vectors = set(minimal)
+        self.ds = []            # the distinct values of d, in increasing order
+        self.staircases = []    # for each, the staircase of the vectors with at most that d
+        points = []
+        for k, (d, s, l) in enumerate(minimal):
+            points.append((s, l))
+            if k + 1 < len(minimal) and minimal[k + 1][0] == d: continue
+            points.sort()
+            ss = []
+            ls = []
+            for s, l in points:
+                if ls and l >= ls[-1]: continue
+                ss.append(s)
+                ls.append(l)
+            self.ds.append(d)
+            self.staircases.append((ss, ls))
+
+    def dominates(self, vector):
+        ''' Returns True if the given (d, s, l) vector is dominated by one of
+            the vectors of the index.  A vector equal to one of the minimal
+            vectors can only be weakly dominated by itself. '''
+        if vector in self.vectors: return False
+        d, s, l = vector
+        i = bisect_right(self.ds, d) - 1
+        if i < 0: return False
+        ss, ls = self.staircases[i]
+        j = bisect_right(ss, s) - 1
+        return j >= 0 and ls[j] <= l
\ No newline at end of file
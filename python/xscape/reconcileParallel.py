@@ -0,0 +1,204 @@
+# reconcileParallel.py
+# Parallel bottom-up Pareto tree reconciliation dynamic programming solver
+# for untimed trees.
+
+# Fills the same tables as reconcileBottomUp.py, but on a pool of worker
+# processes.  The A, C, and Best table rows for a parasite edge depend only
+# on the C and Best table rows of its children, so the rows for disjoint
+# parasite subtrees are independent until their parent edge combines them.
+
+# The parasite tree is therefore cut into tasks:  each task is a connected
+# group of parasite edges with a single top edge, and it depends on the
+# tasks whose top edges are children of its edges.  These dependencies form
+# a tree (the task DAG), and a task is handed to the pool as soon as all the
+# tasks it depends on are done.  A task is sent only the C and Best table
+# rows of the top edges of the tasks it depends on, and sends back only
+# those of its own top edge;  the rows of its other edges are discarded.
+
+# The pool is started after the trees are compiled, so (where processes are
+# forked) the workers inherit the compiled trees and the rest of the solver
+# state copy-on-write rather than having them pickled for every task.
+
+# python libraries
+import multiprocessing
+import Queue
+import traceback
+
+# xscape libraries
+from common import *
+from ParetoFront import *
+from CompiledTree import *
+
+# Base class
+from xscape import ReconcileAlgorithm
+from xscape import reconcileBottomUp
+
+TASKS_PER_PROCESS = 4   # tasks per worker process, for load balancing
+
+# The solver in each worker process, inherited from the parent process
+_algorithm = None
+
+
+class ReconcileAlgorithmParallel(reconcileBottomUp.ReconcileAlgorithmBottomUp):
+
+    def __init__(self, switchLo, switchHi, lossLo, lossHi, hullPrune=False,
+                 tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT, processes=None,
+                 lowMemory=False, switchLimit=None):
+        reconcileBottomUp.ReconcileAlgorithmBottomUp.__init__(self, switchLo, switchHi, lossLo, lossHi,
+                                                              hullPrune, tolerance, counting, lowMemory,
+                                                              switchLimit)
+        # The number of worker processes; None means one per CPU
+        self.processes = processes or multiprocessing.cpu_count()
+        # The queue of finished tasks and their results, which the pool puts
+        # each task on as soon as it is done, during a reconcile
+        self.finished = None
+
+    def reconcile(self, parasiteTree, hostTree, phi):
+        ''' Takes representations of the parasite tree, host tree and phi as
+            input and returns a list of the Pareto optimal solutions.  The
+            trees may be given either as dictionaries or as CompiledTrees. '''
+
+        global _algorithm
+        self.prepare(parasiteTree, hostTree, phi)
+        tops, edges, dependencies = self.tasks()
+        if len(tops) == 1:
+            for ep in edges[0]:
+                self.fillRow(ep)
+            return self.solutions()
+
+        dependents = [[] for top in tops]
+        for task, needed in enumerate(dependencies):
+            for other in needed:
+                dependents[other].append(task)
+        remaining = [len(needed) for needed in dependencies]
+
+        _algorithm = self
+        self.finished = Queue.Queue()
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            pending = 0
+            for task in range(len(tops)):
+                if remaining[task] == 0:
+                    self.submit(pool, task, tops, edges, dependencies)
+                    pending += 1
+            while pending:
+                task, result = self.wait()
+                pending -= 1
+                ep, Crow, BestRow, counters = result
+                self.Cmemo[ep] = Crow
+                self.Bestmemo[ep] = BestRow
+                if counters is not None:
+                    self.profile.addCounters(counters)
+                for other in dependents[task]:
+                    remaining[other] -= 1
+                    if remaining[other] == 0:
+                        self.submit(pool, other, tops, edges, dependencies)
+                        pending += 1
+        finally:
+            pool.terminate()
+            pool.join()
+            _algorithm = None
+            self.finished = None
+        return self.solutions()
+
+    def updateTips(self, phiChanges):
+        ''' Not supported:  only the rows of the top edges of the tasks are
+            kept in this process, and updateTips needs the rows of every
+            ancestor of the changed tips. '''
+        raise ValueError("updateTips needs the DP tables, which the parallel engine does not keep")
+
+    def tasks(self):
+        ''' Cuts the parasite tree into tasks.  Returns the list of the top
+            edges of the tasks, in post-order, the list of the edges of each
+            task, in post-order, and the list of the tasks that each task
+            depends on.  Edges are added to the task below them until it has
+            at least a share of the edges, so the tasks are about equally
+            large. '''
+        parasite = self.parasite
+        size = len(parasite)
+        grain = max(1, size // (self.processes * TASKS_PER_PROCESS))
+        pending = [0] * size        # edges below ep not yet in a task, and ep
+        isTop = [False] * size
+        for ep in range(size):      # post-order
+            pending[ep] = 1
+            if not parasite.tip[ep]:
+                for child in (parasite.left[ep], parasite.right[ep]):
+                    if not isTop[child]: pending[ep] += pending[child]
+            if pending[ep] >= grain or ep == parasite.root:
+                isTop[ep] = True
+
+        tops = [ep for ep in range(size) if isTop[ep]]
+        taskOf = [None] * size
+        for task, top in enumerate(tops): taskOf[top] = task
+        for ep in reversed(range(size)):    # parents before children
+            if not isTop[ep]: taskOf[ep] = taskOf[parasite.parent[ep]]
+
+        edges = [[] for top in tops]
+        dependencies = [[] for top in tops]
+        for ep in range(size):
+            edges[taskOf[ep]].append(ep)
+            if isTop[ep] and ep != parasite.root:
+                dependencies[taskOf[parasite.parent[ep]]].append(taskOf[ep])
+        return tops, edges, dependencies
+
+    def submit(self, pool, task, tops, edges, dependencies):
+        ''' Hands the given task to the pool, with the C and Best table rows
+            that it needs from the tasks it depends on.  When the task is
+            done, it and its result are put on the queue of finished tasks. '''
+        rows = [(tops[other], self.Cmemo[tops[other]], self.Bestmemo[tops[other]])
+                for other in dependencies[task]]
+        if self.lowMemory:
+            # Each row is needed by just this task
+            for other in dependencies[task]:
+                self.Cmemo[tops[other]] = self.Bestmemo[tops[other]] = None
+        finished = self.finished
+        pool.apply_async(solveTask, (edges[task], rows),
+                         callback=lambda errorAndResult: finished.put((task, errorAndResult)))
+
+    def wait(self):
+        ''' Waits for one of the pending tasks to finish and returns it and
+            its result.  Errors in the worker processes are raised here. '''
+        task, (error, result) = self.finished.get()
+        if error is not None:
+            raise RuntimeError("reconciliation task failed:\n" + error)
+        return task, result
+
+
+def solveTask(edges, rows):
+    ''' Runs in a worker process:  fills in the rows for the given parasite
+        edges, in post-order, given the C and Best table rows of the top
+        edges of the tasks below, and returns those of the last (top)
+        edge, with the counters of the task if the algorithm is profiled
+        (see profiling.py).  Returns a pair (error, result) so that errors
+        are reported rather than lost in the pool. '''
+    algorithm = _algorithm
+    profile = algorithm.profile
+    try:
+        if profile is not None: profile.reset()
+        for ep, Crow, BestRow in rows:
+            algorithm.Cmemo[ep] = Crow
+            algorithm.Bestmemo[ep] = BestRow
+        for ep in edges:
+            algorithm.fillRow(ep)
+        top = edges[-1]
+        counters = profile.counters() if profile is not None else None
+        return None, (top, algorithm.Cmemo[top], algorithm.Bestmemo[top], counters)
+    except Exception:
+        return traceback.format_exc(), None
+    finally:
+        # Workers run many tasks, so free the rows they no longer need
+        for ep, Crow, BestRow in rows:
+            algorithm.Cmemo[ep] = algorithm.Bestmemo[ep] = None
+        for ep in edges:
+            algorithm.Amemo[ep] = algorithm.Cmemo[ep] = algorithm.Bestmemo[ep] = None
+
+
+def reconcile(parasiteTree, hostTree, phi, switchLo, switchHi, lossLo, lossHi,
+              hullPrune=False, tolerance=ReconcileAlgorithm.HULL_TOLERANCE, counting=EXACT,
+              processes=None, lowMemory=False, switchLimit=None):
+    ''' Returns the list of Pareto optimal solutions for the given trees and
+        tip associations, using the given number of worker processes. '''
+    reconciliationAlgorithm = ReconcileAlgorithmParallel(switchLo, switchHi, lossLo, lossHi,
+                                                         hullPrune, tolerance, counting, processes, lowMemory,
+                                                         switchLimit)
+    return reconciliationAlgorithm.reconcile(parasiteTree, hostTree, phi)
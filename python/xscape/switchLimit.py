@@ -0,0 +1,110 @@
+# switchLimit.py
+# Restrictions on the host edges to which a parasite may switch
+
+# Without restrictions, a parasite edge on host edge eh may switch to any
+# host edge that is neither an ancestor nor a descendant of eh, so every
+# Best table entry summarizes the C table entries on almost the whole host
+# tree.  A SwitchLimit restricts the landing sites in one or both of two
+# ways:
+#
+#   maxDistance:   the landing site must be at most this many host edges
+#                  away from eh.  The distance is the number of edges on the
+#                  path from eh to the landing site, counting the landing
+#                  site but not eh, so the sibling of eh is at distance 1,
+#                  the sibling of its parent at distance 2, and so on.
+#   allowedPairs:  the landing site must be paired with eh in a given set
+#                  of (from, to) pairs of host edges, named by their end
+#                  vertices as in the input file (see readSwitchPairs).
+#
+# The landing sites of each host edge are then found by walking only its
+# neighborhood (or its listed pairs), and each Best table entry is the
+# Pareto union of the C table entries on those sites.  As without a limit,
+# eh itself is always a landing site.  With no restriction at all (or a
+# maxDistance at least the diameter of the host tree) the results are those
+# of the unrestricted DP.
+
+# xscape libraries
+from CompiledTree import *
+
+class SwitchLimit(object):
+
+    def __init__(self, maxDistance=None, allowedPairs=None):
+        self.maxDistance = maxDistance
+        self.allowedPairs = None
+        if allowedPairs is not None:
+            # from vertex -> set of to vertices
+            self.allowedPairs = {}
+            for fromVertex, toVertex in allowedPairs:
+                self.allowedPairs.setdefault(fromVertex, set()).add(toVertex)
+
+    def key(self):
+        ''' Returns a tuple that identifies the restriction, e.g. in a
+            checkpoint header. '''
+        if self.allowedPairs is None:
+            pairs = None
+        else:
+            pairs = tuple(sorted((fromVertex, toVertex)
+                                 for fromVertex in self.allowedPairs
+                                 for toVertex in self.allowedPairs[fromVertex]))
+        return (self.maxDistance, pairs)
+
+    def landingSites(self, host, e):
+        ''' Returns the sorted list of edges of the CompiledTree host to which
+            a parasite on edge e may switch, including e itself. '''
+        if self.allowedPairs is not None:
+            allowed = self.allowedPairs.get(host.endVertex[e], ())
+            output = set([e])
+            for toVertex in allowed:
+                if toVertex not in host.vertexIndex:
+                    raise ValueError("unknown host vertex in switch pairs: " + repr(toVertex))
+                x = host.vertexIndex[toVertex]
+                if not host.comparable(e, x):
+                    output.add(x)
+            if self.maxDistance is not None:
+                output &= set(host.landingSitesWithin(e, self.maxDistance))
+            return sorted(output)
+        if self.maxDistance is not None:
+            return host.landingSitesWithin(e, self.maxDistance)
+        return host.landingSites(e)
+
+    def allLandingSites(self, host):
+        ''' Returns the list of the landing sites of every edge of the
+            CompiledTree host, indexed by edge number. '''
+        if self.allowedPairs is not None:
+            for fromVertex in self.allowedPairs:
+                if fromVertex not in host.vertexIndex:
+                    raise ValueError("unknown host vertex in switch pairs: " + repr(fromVertex))
+        return [self.landingSites(host, e) for e in range(len(host))]
+
+
+def readSwitchPairs(fileName):
+    ''' Reads a file of allowed switches and returns the list of its (from,
+        to) pairs.  Each line names the end vertex of a host edge from which
+        a parasite may switch and the end vertex of a host edge on which it
+        may land, separated by white space.  Blank lines and lines starting
+        with # are ignored.  Pairs are not symmetric:  a switch in each
+        direction needs its own line. '''
+    pairs = []
+    fileHandle = open(fileName, "r")
+    try:
+        for lineNumber, line in enumerate(fileHandle):
+            line = line.strip()
+            if line == "" or line.startswith("#"): continue
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError("%s, line %d:  expected two host vertex names" %
+                                 (fileName, lineNumber + 1))
+            pairs.append((fields[0], fields[1]))
+    finally:
+        fileHandle.close()
+    return pairs
+
+def makeSwitchLimit(maxDistance=None, switchPairsFile=None):
+    ''' Returns the SwitchLimit for the given maximum switch distance and
+        file of allowed switches, either of which may be None, or None if
+        neither is given. '''
+    if maxDistance is None and switchPairsFile is None: return None
+    allowedPairs = None
+    if switchPairsFile is not None:
+        allowedPairs = readSwitchPairs(switchPairsFile)
+    return SwitchLimit(maxDistance, allowedPairs)